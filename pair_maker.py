@@ -3,71 +3,537 @@ import random
 import pandas as pd
 from datetime import datetime
 import copy
-from itertools import combinations
+import os
+import io
+import csv
+import json
+import tempfile
+import threading
+import uuid
+import weakref
+from array import array
+from collections import OrderedDict
+from itertools import combinations, islice
 from collections import defaultdict
+import networkx as nx
+import numpy as np
+
+EXPORT_COLUMNS = ["배치차수", "조", "첫번째", "두번째", "세번째"]
+TRIO_PLAN_SCAN_LIMIT = 5000  # 3명조 계획 시 배치마다 확인할 최대 후보 수
+DIVERSE_ROUND_SAMPLES = 3  # 후보 다양화 시 배치마다 비교할 유효 배치 수 (겹침이 가장 적은 것 사용)
+
+class NameTable:
+    """사람 ↔ 정수 id 대응표 (여러 스케줄이 같은 표를 공유할 수 있음)"""
+    __slots__ = ("names", "index", "__weakref__")
+    _shared = weakref.WeakValueDictionary()  # 참가자 목록 → 사용 중인 공유 이름표
+    
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+    
+    @classmethod
+    def shared(cls, names):
+        """같은 참가자 목록이면 같은 이름표를 재사용 (쓰는 스케줄이 없어지면 자동 해제)"""
+        key = tuple(names)
+        table = cls._shared.get(key)
+        # 나중에 다른 사람이 추가된 이름표는 재사용하지 않음
+        if table is None or len(table) != len(key):
+            table = cls(key)
+            cls._shared[key] = table
+        return table
+    
+    def id_of(self, name):
+        """이름의 id를 반환 (처음 보는 이름이면 새로 등록)"""
+        person_id = self.index.get(name)
+        if person_id is None:
+            person_id = len(self.names)
+            self.index[name] = person_id
+            self.names.append(name)
+        return person_id
+    
+    def pair_slot(self, a, b):
+        """두 사람 조합의 삼각 배열 칸 번호 (등록되지 않은 사람이거나 같은 사람이면 None)
+        
+        id가 i < j일 때 j * (j - 1) / 2 + i 이므로 사람이 추가되어도 기존 칸은 그대로입니다.
+        """
+        i = self.index.get(a)
+        j = self.index.get(b)
+        if i is None or j is None or i == j:
+            return None
+        if i > j:
+            i, j = j, i
+        return j * (j - 1) // 2 + i
+    
+    def pair_at(self, slot):
+        """삼각 배열 칸 번호를 정렬된 이름 튜플로 복원"""
+        j = int((1 + (1 + 8 * slot) ** 0.5) // 2)
+        while j * (j - 1) // 2 > slot:
+            j -= 1
+        while (j + 1) * j // 2 <= slot:
+            j += 1
+        a, b = self.names[slot - j * (j - 1) // 2], self.names[j]
+        return (a, b) if a <= b else (b, a)
+    
+    def __len__(self):
+        return len(self.names)
+
+class PairSet:
+    """2명 조합 집합 (조합마다 1비트인 삼각 비트 배열, 공유 이름표의 id 사용)
+    
+    튜플 조합을 그대로 넣고 조회할 수 있어 set 대신 쓸 수 있으며, 조합마다
+    튜플과 해시 슬롯을 만들지 않으므로 인원이 같으면 메모리가 일정합니다.
+    """
+    __slots__ = ("name_table", "_bits", "_count")
+    
+    def __init__(self, name_table, pairs=()):
+        self.name_table = name_table
+        self._bits = bytearray()
+        self._count = 0
+        self.update(pairs)
+    
+    def add(self, pair):
+        name_table = self.name_table
+        name_table.id_of(pair[0])
+        name_table.id_of(pair[1])
+        slot = name_table.pair_slot(pair[0], pair[1])
+        if slot is None:
+            return
+        byte, bit = slot >> 3, 1 << (slot & 7)
+        if byte >= len(self._bits):
+            size = len(name_table)
+            self._bits.extend(bytes((size * (size - 1) // 2 + 7) // 8 - len(self._bits)))
+        if not self._bits[byte] & bit:
+            self._bits[byte] |= bit
+            self._count += 1
+    
+    def update(self, pairs):
+        for pair in pairs:
+            self.add(pair)
+    
+    def discard(self, pair):
+        if pair in self:
+            slot = self.name_table.pair_slot(pair[0], pair[1])
+            self._bits[slot >> 3] &= ~(1 << (slot & 7)) & 0xFF
+            self._count -= 1
+    
+    def __contains__(self, pair):
+        # 탐색 중 가장 많이 호출되므로 pair_slot을 풀어서 계산
+        index = self.name_table.index
+        i = index.get(pair[0])
+        j = index.get(pair[1])
+        if i is None or j is None or i == j:
+            return False
+        if i > j:
+            i, j = j, i
+        slot = j * (j - 1) // 2 + i
+        byte = slot >> 3
+        return byte < len(self._bits) and self._bits[byte] >> (slot & 7) & 1 == 1
+    
+    def free_partners(self, person, candidates):
+        """candidates 중 person과의 조합이 집합에 없는 사람들 (한 사람 기준으로 일괄 조회)"""
+        index = self.name_table.index
+        bits = self._bits
+        byte_count = len(bits)
+        i = index.get(person)
+        if i is None:
+            return list(candidates)
+        
+        free = []
+        for other in candidates:
+            j = index.get(other)
+            if j is None or j == i:
+                free.append(other)
+                continue
+            slot = j * (j - 1) // 2 + i if i < j else i * (i - 1) // 2 + j
+            byte = slot >> 3
+            if byte >= byte_count or not bits[byte] >> (slot & 7) & 1:
+                free.append(other)
+        return free
+    
+    def __len__(self):
+        return self._count
+    
+    def __iter__(self):
+        pair_at = self.name_table.pair_at
+        for byte_idx, byte in enumerate(self._bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield pair_at(byte_idx * 8 + bit)
+    
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+def widen_array(values):
+    """값이 넘친 부호 없는 정수 배열을 한 단계 큰 타입으로 복사"""
+    return array({"B": "H", "H": "I", "I": "Q"}[values.typecode], values)
+
+class PairHistory:
+    """2명 조합별 (만난 횟수, 마지막으로 만난 배치 번호)를 삼각 배열 두 개에 저장
+    
+    만난 적이 있는 조합이 곧 사용된 조합이므로 집합처럼 조회·순회할 수도 있습니다.
+    두 배열은 uint8로 시작해 값이 넘칠 때만 넓히므로, 보통의 배치 수에서는
+    조합당 2바이트입니다.
+    """
+    __slots__ = ("name_table", "_counts", "_last_rounds", "_met")
+    
+    def __init__(self, name_table):
+        self.name_table = name_table
+        self._counts = array("B")
+        self._last_rounds = array("B")
+        self._met = 0  # 한 번 이상 만난 조합 수
+    
+    def get(self, pair):
+        """(만난 횟수, 마지막 배치 번호) 또는 만난 적이 없으면 None"""
+        slot = self.name_table.pair_slot(pair[0], pair[1])
+        if slot is None or slot >= len(self._counts) or not self._counts[slot]:
+            return None
+        return self._counts[slot], self._last_rounds[slot]
+    
+    def record(self, pair, round_num):
+        """조합이 round_num 배치에서 만났음을 기록 (처음 만났으면 True)"""
+        name_table = self.name_table
+        name_table.id_of(pair[0])
+        name_table.id_of(pair[1])
+        slot = name_table.pair_slot(pair[0], pair[1])
+        if slot >= len(self._counts):
+            size = len(name_table)
+            grow = size * (size - 1) // 2 - len(self._counts)
+            self._counts.extend(array(self._counts.typecode, [0]) * grow)
+            self._last_rounds.extend(array(self._last_rounds.typecode, [0]) * grow)
+        
+        count = self._counts[slot] + 1
+        try:
+            self._counts[slot] = count
+        except OverflowError:
+            self._counts = widen_array(self._counts)
+            self._counts[slot] = count
+        try:
+            self._last_rounds[slot] = round_num
+        except OverflowError:
+            self._last_rounds = widen_array(self._last_rounds)
+            self._last_rounds[slot] = round_num
+        
+        self._met += count == 1
+        return count == 1
+    
+    def __contains__(self, pair):
+        return self.get(pair) is not None
+    
+    def __len__(self):
+        return self._met
+    
+    def __iter__(self):
+        pair_at = self.name_table.pair_at
+        for slot, count in enumerate(self._counts):
+            if count:
+                yield pair_at(slot)
+    
+    def lookup(self, first_ids, second_ids):
+        """id 배열 쌍들의 (만난 횟수, 마지막 배치 번호)를 numpy 배열로 한 번에 조회"""
+        low = np.minimum(first_ids, second_ids).astype(np.int64)
+        high = np.maximum(first_ids, second_ids).astype(np.int64)
+        slots = high * (high - 1) // 2 + low
+        counts = np.zeros(len(slots), dtype=np.int64)
+        last_rounds = np.zeros(len(slots), dtype=np.int64)
+        
+        # 배열 뷰는 바로 복사해서 버림 (뷰가 남아 있으면 이후 extend가 막힘)
+        known = slots < len(self._counts)
+        if known.any():
+            counts[known] = np.frombuffer(self._counts, dtype=self._counts.typecode)[slots[known]]
+            last_rounds[known] = np.frombuffer(self._last_rounds, dtype=self._last_rounds.typecode)[slots[known]]
+        return counts, last_rounds
+    
+    def values(self):
+        """만난 조합들의 (만난 횟수, 마지막 배치 번호)"""
+        return [(count, last_round) for count, last_round in zip(self._counts, self._last_rounds) if count]
+    
+    @property
+    def nbytes(self):
+        return len(self._counts) * self._counts.itemsize + len(self._last_rounds) * self._last_rounds.itemsize
+
+class CompactSchedule:
+    """배열 기반의 압축된 배치 목록
+    
+    모든 배치의 사람 id를 하나의 평탄한 int32 배열에 이어 붙이고, 각 조의
+    시작 위치(배치 안에서의 오프셋)는 uint16 경계 배열에 둡니다. 배치마다
+    튜플과 리스트를 만들지 않으므로 긴 이력에서도 메모리가 작고, 기존 코드가
+    쓰는 튜플 목록 형태는 인덱싱할 때 그때그때 만들어 줍니다.
+    """
+    __slots__ = ("name_table", "_ids", "_group_offsets", "_round_id_starts", "_round_group_starts")
+    
+    def __init__(self, name_table=None):
+        self.name_table = name_table if name_table is not None else NameTable()
+        self._ids = array("i")  # 모든 배치의 사람 id (int32)
+        self._group_offsets = array("H")  # 조마다 배치 안에서의 시작 위치
+        self._round_id_starts = array("i", [0])  # 배치마다 _ids 시작 위치 (+ 끝 표시)
+        self._round_group_starts = array("i", [0])  # 배치마다 _group_offsets 시작 위치 (+ 끝 표시)
+    
+    def append(self, arrangement):
+        """튜플 목록 형태의 배치를 압축해서 추가"""
+        id_of = self.name_table.id_of
+        round_start = len(self._ids)
+        for group in arrangement:
+            self._group_offsets.append(len(self._ids) - round_start)
+            self._ids.extend(id_of(person) for person in group)
+        self._round_id_starts.append(len(self._ids))
+        self._round_group_starts.append(len(self._group_offsets))
+    
+    def clear(self):
+        del self._ids[:]
+        del self._group_offsets[:]
+        del self._round_id_starts[1:]
+        del self._round_group_starts[1:]
+    
+    def __len__(self):
+        return len(self._round_id_starts) - 1
+    
+    def round_groups(self, round_idx):
+        """배치 하나를 id 튜플 목록으로 반환"""
+        round_ids = self._ids[self._round_id_starts[round_idx]:self._round_id_starts[round_idx + 1]]
+        offsets = self._group_offsets[self._round_group_starts[round_idx]:self._round_group_starts[round_idx + 1]]
+        ends = list(offsets[1:]) + [len(round_ids)]
+        return [tuple(round_ids[start:end]) for start, end in zip(offsets, ends)]
+    
+    def __getitem__(self, round_idx):
+        """배치 하나를 이름 튜플 목록으로 반환 (슬라이스는 배치 목록)"""
+        if isinstance(round_idx, slice):
+            return [self[i] for i in range(*round_idx.indices(len(self)))]
+        if round_idx < 0:
+            round_idx += len(self)
+        if not 0 <= round_idx < len(self):
+            raise IndexError("배치 번호가 범위를 벗어났습니다")
+        names = self.name_table.names
+        return [tuple(names[person_id] for person_id in group) for group in self.round_groups(round_idx)]
+    
+    def __iter__(self):
+        for round_idx in range(len(self)):
+            yield self[round_idx]
+    
+    def iter_groups(self):
+        """(배치 번호, 조 번호, 이름 튜플)을 배열에서 바로 하나씩 생성"""
+        names = self.name_table.names
+        for round_idx in range(len(self)):
+            for group_idx, group in enumerate(self.round_groups(round_idx)):
+                yield round_idx, group_idx, tuple(names[person_id] for person_id in group)
+    
+    def as_arrays(self):
+        """(사람 id, 조별 전체 시작 위치, 배치별 첫 조 번호)를 numpy int32 배열로 반환
+        
+        버퍼를 계속 잡고 있으면 이후 append가 막히므로 memcpy 한 번으로 복사합니다.
+        """
+        ids = np.frombuffer(self._ids, dtype=np.int32).copy() if self._ids else np.empty(0, dtype=np.int32)
+        round_group_starts = np.frombuffer(self._round_group_starts, dtype=np.int32).copy()
+        offsets = (np.frombuffer(self._group_offsets, dtype=np.uint16).copy()
+                   if self._group_offsets else np.empty(0, dtype=np.uint16))
+        
+        # 배치 안 오프셋 + 배치 시작 위치 = 전체 배열에서의 조 시작 위치
+        round_id_starts = np.frombuffer(self._round_id_starts, dtype=np.int32).copy()
+        groups_per_round = np.diff(round_group_starts)
+        group_starts = offsets.astype(np.int32) + np.repeat(round_id_starts[:-1], groups_per_round)
+        return ids, group_starts, round_group_starts
+    
+    @property
+    def nbytes(self):
+        """배열이 차지하는 바이트 수 (공유 이름표 제외)"""
+        return sum(a.itemsize * len(a) for a in (
+            self._ids, self._group_offsets, self._round_id_starts, self._round_group_starts
+        ))
+
+def verify_schedule(schedule, people_count=None, allow_repeats=False, forbidden_pairs=None):
+    """스케줄 전체를 numpy로 한 번에 검증
+    
+    schedule은 CompactSchedule, OptimizedPairMaker, 또는 튜플 목록 형태의 배치
+    목록을 받습니다. 모든 배치가 전원을 정확히 한 번씩 포함하는 분할인지, 조
+    크기가 2명(홀수 인원이면 3명조 하나 추가)인지, 같은 조합이 반복되지 않는지
+    (뒤집힌 튜플 포함), 금지 조합이 없는지, 3명조 참여 횟수 차이가 1 이하인지를
+    확인해 결과 딕셔너리를 반환합니다.
+    """
+    if isinstance(schedule, OptimizedPairMaker):
+        schedule = schedule.arrangements
+    if not isinstance(schedule, CompactSchedule):
+        compact = CompactSchedule()
+        for arrangement in schedule:
+            compact.append(arrangement)
+        schedule = compact
+    
+    errors = []
+    ids, group_starts, round_group_starts = schedule.as_arrays()
+    round_count = len(schedule)
+    if people_count is None:
+        people_count = len(schedule.name_table)
+    n = max(people_count, 1)
+    
+    group_sizes = np.diff(np.append(group_starts, len(ids)))
+    groups_per_round = np.diff(round_group_starts)
+    round_of_group = np.repeat(np.arange(round_count), groups_per_round)
+    
+    # 코드 값이 int32에 들어가면 int32로 계산 (메모리 대역폭 절반)
+    code_type = np.int32 if n * max(n, round_count) < 2 ** 31 else np.int64
+    
+    # 1. 분할 검사: (배치, 사람) 쌍이 정확히 한 번씩 등장해야 함
+    if len(ids) and (ids.max() >= people_count or ids.min() < 0):
+        errors.append("참가자 범위를 벗어난 id가 있습니다.")
+    elif round_count:
+        round_sizes = np.bincount(round_of_group, weights=group_sizes, minlength=round_count).astype(np.int64)
+        if len(ids) == round_count * people_count and np.all(round_sizes == people_count):
+            # 배치 크기가 모두 같으면 repeat 없이 2차원으로 바로 오프셋 계산
+            slots = (ids.reshape(round_count, people_count).astype(code_type)
+                     + (np.arange(round_count, dtype=code_type) * n)[:, None]).ravel()
+        else:
+            slots = np.repeat(round_of_group, group_sizes).astype(code_type) * n + ids
+        slot_counts = np.bincount(slots, minlength=round_count * n)
+        bad_rounds = np.flatnonzero((slot_counts.reshape(round_count, n) != 1).any(axis=1))
+        for round_idx in bad_rounds[:5]:
+            errors.append(f"{round_idx + 1}차 배치가 전원을 정확히 한 번씩 포함하지 않습니다. ({round_sizes[round_idx]}명)")
+    
+    # 2. 조 크기 검사: 2명조, 홀수 인원이면 3명조 정확히 하나
+    if np.any((group_sizes != 2) & (group_sizes != 3)):
+        errors.append("2명이나 3명이 아닌 조가 있습니다.")
+    trios_per_round = np.bincount(round_of_group[group_sizes == 3], minlength=round_count)
+    expected_trios = people_count % 2
+    if np.any(trios_per_round != expected_trios):
+        errors.append(f"배치마다 3명조가 {expected_trios}개여야 합니다.")
+    
+    # 3. 조합 추출: 2명조는 (0,1), 3명조는 (0,1), (0,2), (1,2)
+    pair_starts = group_starts[group_sizes == 2]
+    trio_starts = group_starts[group_sizes == 3]
+    first = np.concatenate([ids[pair_starts], ids[trio_starts], ids[trio_starts], ids[trio_starts + 1]]).astype(code_type)
+    second = np.concatenate([ids[pair_starts + 1], ids[trio_starts + 1], ids[trio_starts + 2], ids[trio_starts + 2]]).astype(code_type)
+    
+    # 뒤집힌 튜플도 같은 조합이 되도록 (작은 id, 큰 id)로 정규화해 정수 코드화
+    codes = np.minimum(first, second) * n + np.maximum(first, second)
+    if not len(codes):
+        repeated = 0
+    elif n * n <= 4 * len(codes):
+        # 가능한 조합 수가 작으면 정렬 대신 O(E) 카운팅
+        repeated = int(len(codes) - np.count_nonzero(np.bincount(codes, minlength=n * n)))
+    else:
+        codes.sort()
+        repeated = int(np.count_nonzero(codes[1:] == codes[:-1]))
+    if repeated and not allow_repeats:
+        errors.append(f"중복된 조합이 {repeated}개 있습니다.")
+    
+    if forbidden_pairs:
+        index = schedule.name_table.index
+        forbidden_codes = np.array([
+            min(index[a], index[b]) * n + max(index[a], index[b])
+            for a, b in forbidden_pairs if a in index and b in index
+        ], dtype=np.int64)
+        forbidden_hits = int(np.count_nonzero(np.isin(codes, forbidden_codes)))
+        if forbidden_hits:
+            errors.append(f"금지 조합이 {forbidden_hits}번 배치되었습니다.")
+    
+    # 4. 3명조 공정성: 참여 횟수 최대-최소 차이가 1 이하
+    trio_spread = 0
+    if expected_trios and len(trio_starts):
+        trio_members = np.concatenate([ids[trio_starts], ids[trio_starts + 1], ids[trio_starts + 2]])
+        trio_counts = np.bincount(trio_members, minlength=people_count)[:people_count]
+        trio_spread = int(trio_counts.max() - trio_counts.min())
+    
+    return {
+        "valid": not errors,
+        "errors": errors,
+        "rounds": round_count,
+        "edges": len(codes),
+        "repeated_edges": repeated,
+        "trio_spread": trio_spread,
+        "is_trio_fair": trio_spread <= 1,
+    }
 
 class OptimizedPairMaker:
-    def __init__(self):
-        self.used_pairs = set()  # 이미 사용된 2명 조합들
-        self.arrangements = []  # 최종 배치들을 저장
+    def __init__(self, template_library=None):
+        self.forbidden_pairs = set()  # 절대 짝이 되면 안 되는 2명 조합들
+        self.required_pairs = {}  # 배치 번호 → 그 배치에 반드시 넣을 2명 조합들
+        self.arrangements = CompactSchedule()  # 최종 배치들을 압축해서 저장
+        self.blocked_pairs = PairSet(self.arrangements.name_table)  # 탐색 시 조회하는 통합 인덱스 (사용됨 + 금지 + 고정)
+        self.pair_history = PairHistory(self.arrangements.name_table)  # 2명 조합 → (만난 횟수, 마지막으로 만난 배치 번호)
         self.trio_assignments = []  # 각 배치별 3명조 계획
         self.people_list = []
         self._available_pairs_cache = None  # 캐시 추가
+        self._excluded_pairs = set()  # 금지 + 고정 조합 (중복 최소화 모드에서 제외)
+        self._reserved_pairs = set()  # 뒤 배치의 3명조로 계획되어 2명조 탐색에서 제외한 조합
+        self.repeat_from_round = None  # 중복 최소화 모드로 전환된 배치 번호
+        self.template_library = template_library  # 미리 계산된 라운드 템플릿 (없으면 매번 탐색)
+        self.diversity_counts = {}  # 2명 조합 → 앞서 만든 후보 중 그 조합을 사용한 후보 수
+        
+        # add_arrangement에서 점진적으로 갱신하는 통계 (조회는 재계산 없이)
+        self.trio_counts = {}  # 사람 → 3명조 참여 횟수
+        self.partner_counts = {}  # 사람 → 만나본 서로 다른 사람 수
+        self._trio_count_hist = defaultdict(int)  # 3명조 참여 횟수 → 해당 인원 수
+        self._partner_count_hist = defaultdict(int)  # 만나본 사람 수 → 해당 인원 수
+        self.total_meetings = 0  # 반복 포함 전체 만남 수
+        self.trio_round_count = 0  # 3명조가 있었던 배치 수
+        self.round_summaries = []  # 배치별 요약
+        self._stats_cache = {}  # 조회 결과 캐시 (배치가 추가되면 비움)
         
+    @property
+    def used_pairs(self):
+        """이미 사용된 2명 조합들 (만난 기록이 있는 조합)"""
+        return self.pair_history
+    
+    @staticmethod
+    def pair_key(a, b):
+        """2명 조합을 정렬된 튜플로 정규화 (순서와 무관하게 같은 키)"""
+        return (a, b) if a <= b else (b, a)
+    
     def plan_trio_distribution(self, people_list, target_count):
-        """전체 배치에 걸쳐 3명조 배분을 미리 계획"""
+        """전체 배치에 걸쳐 3명조 배분을 미리 계획
+        
+        매 배치마다 (지금까지의 참여 횟수를 포함해) 참여가 가장 적은 사람들로
+        3명조를 정하고, 계획된 3명조끼리는 같은 조합을 나누지 않게 해서 각 배치
+        차례에 새 조합으로 그대로 쓸 수 있도록 합니다.
+        """
         if len(people_list) % 2 == 0:
             return []  # 짝수면 3명조 없음
         
-        people_count = len(people_list)
+        counts = {p: self.trio_counts.get(p, 0) for p in people_list}
+        planned_pairs = set()
+        blocked = self.blocked_pairs
+        key = self.pair_key
         trio_plan = []
         
-        # 최적화: 미리 계산
-        total_trio_slots = target_count * 3
-        base_count = total_trio_slots // people_count
-        extra_count = total_trio_slots % people_count
+        for _ in range(target_count):
+            ordered = sorted(people_list, key=lambda p: (counts[p], random.random()))
+            
+            # 참여 횟수가 세 번째로 적은 사람 이하인 사람들 중에서만 선택 (공정성 유지)
+            threshold = counts[ordered[2]]
+            pool = [p for p in ordered if counts[p] <= threshold]
+            
+            trio_members = None
+            for candidate in islice(combinations(pool, 3), TRIO_PLAN_SCAN_LIMIT):
+                pairs = [key(a, b) for a, b in combinations(candidate, 2)]
+                if not any(pair in planned_pairs or pair in blocked for pair in pairs):
+                    trio_members = list(candidate)
+                    break
+            
+            # 겹치지 않는 3명조가 없으면 참여가 가장 적은 세 명 (배치 차례에 보정)
+            if trio_members is None:
+                trio_members = ordered[:3]
+            
+            trio_plan.append(trio_members)
+            planned_pairs.update(key(a, b) for a, b in combinations(trio_members, 2))
+            for member in trio_members:
+                counts[member] += 1
         
-        # 목표 참여 횟수 미리 할당 (딕셔너리 대신 리스트 사용)
-        target_counts = [base_count + (1 if i < extra_count else 0) for i in range(people_count)]
-        current_counts = [0] * people_count
+        return trio_plan
+    
+    def reserve_trio_pairs(self, trio_plan):
+        """남은 배치에 계획된 3명조의 조합을 2명조 탐색에서 미리 제외"""
+        key = self.pair_key
+        used = self.used_pairs
+        excluded = self._excluded_pairs
+        blocked = self.blocked_pairs
         
-        for round_num in range(target_count):
-            # 가중치 기반 선택 (더 효율적)
-            weights = [max(0, target_counts[i] - current_counts[i]) for i in range(people_count)]
-            
-            if sum(weights) >= 3:
-                # 가중 랜덤 선택 최적화
-                trio_indices = []
-                for _ in range(3):
-                    if sum(weights) == 0:
-                        break
-                    # 가중치 기반 선택
-                    total_weight = sum(weights)
-                    r = random.random() * total_weight
-                    cumsum = 0
-                    for i, w in enumerate(weights):
-                        cumsum += w
-                        if r <= cumsum:
-                            trio_indices.append(i)
-                            weights[i] = 0  # 중복 방지
-                            break
-                
-                # 3명이 안 되면 랜덤으로 채우기
-                while len(trio_indices) < 3:
-                    remaining = [i for i in range(people_count) if i not in trio_indices]
-                    if remaining:
-                        trio_indices.append(random.choice(remaining))
-                
-                trio_members = [people_list[i] for i in trio_indices]
-                trio_plan.append(trio_members)
-                
-                # 카운트 업데이트
-                for i in trio_indices:
-                    current_counts[i] += 1
-            else:
-                trio_plan.append([])
+        # 이전 예약 해제 (그 사이 실제로 사용된 조합은 계속 막아 둠)
+        for pair in self._reserved_pairs:
+            if pair not in used:
+                blocked.discard(pair)
         
-        return trio_plan
+        reserved = {key(a, b) for trio_members in trio_plan for a, b in combinations(trio_members, 2)}
+        self._reserved_pairs = {pair for pair in reserved if pair not in used and pair not in excluded}
+        blocked.update(self._reserved_pairs)
     
     def get_available_pairs(self, people_list):
         """사용 가능한 2명 조합들을 반환 (캐싱 최적화)"""
@@ -79,7 +545,7 @@ class OptimizedPairMaker:
             available = []
             for pair in combinations(people_list, 2):
                 sorted_pair = tuple(sorted(pair))
-                if sorted_pair not in self.used_pairs:
+                if sorted_pair not in self.blocked_pairs:
                     available.append(sorted_pair)
             
             self._available_pairs_cache = available
@@ -126,12 +592,7 @@ class OptimizedPairMaker:
         total_needed = len(people_list) // 2
         available_count = 0
         for i in range(len(people_list)):
-            for j in range(i + 1, len(people_list)):
-                pair = tuple(sorted([people_list[i], people_list[j]]))
-                if pair not in self.used_pairs:
-                    available_count += 1
-                    if available_count >= total_needed:
-                        break
+            available_count += len(self.blocked_pairs.free_partners(people_list[i], people_list[i + 1:]))
             if available_count >= total_needed:
                 break
         
@@ -143,6 +604,10 @@ class OptimizedPairMaker:
     
     def greedy_pairing_with_backtrack(self, people_list):
         """그리디 알고리즘으로 빠르게 시도 후 실패시 백트래킹"""
+        # 후보 다양화 중이면 덜 겹치는 짝부터 고르는 백트래킹으로 바로 진행
+        if self.diversity_counts:
+            return self.backtrack_pairing_optimized(people_list)
+        
         # 1단계: 그리디 시도 (빠름)
         shuffled = people_list.copy()
         random.shuffle(shuffled)
@@ -153,7 +618,7 @@ class OptimizedPairMaker:
         for i in range(0, len(shuffled) - 1, 2):
             if shuffled[i] not in used_people and shuffled[i + 1] not in used_people:
                 pair = tuple(sorted([shuffled[i], shuffled[i + 1]]))
-                if pair not in self.used_pairs:
+                if pair not in self.blocked_pairs:
                     pairs.append(pair)
                     used_people.add(shuffled[i])
                     used_people.add(shuffled[i + 1])
@@ -167,6 +632,8 @@ class OptimizedPairMaker:
     
     def backtrack_pairing_optimized(self, people_list):
         """최적화된 백트래킹"""
+        diversity = self.diversity_counts
+        
         def backtrack(remaining, current_pairs):
             if not remaining:
                 return current_pairs
@@ -176,18 +643,16 @@ class OptimizedPairMaker:
             others = remaining[1:]
             
             # 미리 가능한 짝들만 필터링
-            valid_partners = []
-            for other in others:
-                pair = tuple(sorted([first, other]))
-                if pair not in self.used_pairs:
-                    valid_partners.append(other)
+            valid_partners = self.blocked_pairs.free_partners(first, others)
             
             # 가능한 짝이 없으면 실패
             if not valid_partners:
                 return None
             
-            # 랜덤 순서로 시도
+            # 랜덤 순서로 시도 (후보 다양화 중이면 앞선 후보들과 덜 겹치는 짝부터)
             random.shuffle(valid_partners)
+            if diversity:
+                valid_partners.sort(key=lambda partner: diversity.get(self.pair_key(first, partner), 0))
             
             for partner in valid_partners:
                 pair = tuple(sorted([first, partner]))
@@ -243,51 +708,386 @@ class OptimizedPairMaker:
     
     def is_arrangement_valid(self, arrangement):
         """배치 유효성 확인 (최적화)"""
+        key = self.pair_key
         for group in arrangement:
             if len(group) == 2:
-                if group in self.used_pairs:
+                if key(group[0], group[1]) in self.blocked_pairs:
                     return False
             elif len(group) == 3:
                 # 3개 조합 직접 확인 (더 빠름)
-                if ((group[0], group[1]) in self.used_pairs or
-                    (group[0], group[2]) in self.used_pairs or
-                    (group[1], group[2]) in self.used_pairs):
+                if (key(group[0], group[1]) in self.blocked_pairs or
+                    key(group[0], group[2]) in self.blocked_pairs or
+                    key(group[1], group[2]) in self.blocked_pairs):
                     return False
         return True
     
+    def reset_statistics(self, people_list):
+        """점진 통계를 참가자 목록 기준으로 초기화"""
+        self.trio_counts = {person: 0 for person in people_list}
+        self.partner_counts = {person: 0 for person in people_list}
+        self._trio_count_hist = defaultdict(int, {0: len(self.trio_counts)} if people_list else {})
+        self._partner_count_hist = defaultdict(int, {0: len(self.partner_counts)} if people_list else {})
+        self.total_meetings = 0
+        self.trio_round_count = 0
+        self.round_summaries = []
+        self._stats_cache = {}
+    
+    @staticmethod
+    def _bump(counts, hist, person):
+        """사람별 횟수를 1 올리고 횟수 분포(히스토그램)도 함께 갱신"""
+        old = counts.get(person)
+        if old is None:
+            old = 0
+            hist[0] += 1
+        counts[person] = old + 1
+        hist[old] -= 1
+        if hist[old] == 0:
+            del hist[old]
+        hist[old + 1] += 1
+    
+    def update_statistics(self, arrangement, new_pairs, first_meetings):
+        """배치 하나만큼 통계를 갱신 (전체 배치를 다시 훑지 않음)"""
+        trio = None
+        for group in arrangement:
+            if len(group) == 3:
+                trio = group
+                for person in group:
+                    self._bump(self.trio_counts, self._trio_count_hist, person)
+        if trio is not None:
+            self.trio_round_count += 1
+        
+        for a, b in first_meetings:
+            self._bump(self.partner_counts, self._partner_count_hist, a)
+            self._bump(self.partner_counts, self._partner_count_hist, b)
+        
+        self.total_meetings += len(new_pairs)
+        self.round_summaries.append({
+            "round": len(self.round_summaries) + 1,
+            "groups": len(arrangement),
+            "new_pairs": len(first_meetings),
+            "repeated_pairs": len(new_pairs) - len(first_meetings),
+            "trio": trio,
+        })
+        self._stats_cache = {}
+    
     def add_arrangement(self, arrangement):
         """배치를 추가하고 사용된 조합들을 기록 (최적화)"""
         new_pairs = set()
+        first_meetings = []
+        key = self.pair_key
         
+        # 랜덤화로 뒤집힌 튜플도 같은 조합으로 기록되도록 정규화
         for group in arrangement:
             if len(group) == 2:
-                new_pairs.add(group)
+                new_pairs.add(key(group[0], group[1]))
             elif len(group) == 3:
                 # 직접 추가 (함수 호출 오버헤드 제거)
-                new_pairs.add((group[0], group[1]))
-                new_pairs.add((group[0], group[2]))
-                new_pairs.add((group[1], group[2]))
+                new_pairs.add(key(group[0], group[1]))
+                new_pairs.add(key(group[0], group[2]))
+                new_pairs.add(key(group[1], group[2]))
+        
+        # 만난 횟수와 마지막 배치 번호 기록 (중복 최소화 모드의 비용 계산용)
+        round_num = len(self.arrangements)
+        for pair in new_pairs:
+            if self.pair_history.record(pair, round_num):
+                first_meetings.append(pair)
         
         # 배치로 추가
-        self.used_pairs.update(new_pairs)
+        self.blocked_pairs.update(new_pairs)
         self.arrangements.append(arrangement)
+        self.update_statistics(arrangement, new_pairs, first_meetings)
         
         # 캐시 무효화
         self._available_pairs_cache = None
     
-    def generate_multiple_arrangements(self, people_list, target_count=5):
-        """개선된 알고리즘으로 여러 배치 생성 (최적화)"""
+    def pair_cost(self, a, b, round_num):
+        """반복 비용 계산: 많이 만났을수록, 최근에 만났을수록 비용이 큼"""
+        history = self.pair_history.get(self.pair_key(a, b))
+        if history is None:
+            return 0
+        
+        count, last_round = history
+        # 만난 횟수가 우선, 횟수가 같으면 최근에 만난 조합이 더 비쌈
+        # (last_round < round_num 이므로 횟수 1 차이가 항상 더 큼)
+        return count * (round_num + 1) + (last_round + 1)
+    
+    def min_cost_pairing(self, people_list, round_num):
+        """가중치 블로섬 알고리즘으로 반복 비용이 최소인 완전 매칭 (다항 시간)
+        
+        (조합 목록, 총 비용)을 반환하며, 완전 매칭이 없으면 (None, None)을 반환합니다.
+        """
+        if len(people_list) == 0:
+            return [], 0
+        if len(people_list) % 2 != 0:
+            return None, None
+        
+        # 동점 조합 사이의 선택이 매번 달라지도록 정점 순서를 섞음
+        shuffled = people_list.copy()
+        random.shuffle(shuffled)
+        
+        # 모든 조합의 반복 비용을 이력 배열에서 한 번에 계산 (pair_cost와 같은 식)
+        id_of = self.arrangements.name_table.id_of
+        ids = np.array([id_of(person) for person in shuffled], dtype=np.int64)
+        first, second = np.triu_indices(len(shuffled), 1)
+        counts, last_rounds = self.pair_history.lookup(ids[first], ids[second])
+        pair_costs = counts * (round_num + 1) + (last_rounds + 1) * (counts > 0)
+        
+        # 금지/고정 조합과 뒤 배치의 3명조로 예약된 조합은 그래프에서 제외
+        excluded = self._excluded_pairs
+        if self._reserved_pairs:
+            excluded = excluded | self._reserved_pairs
+        costs = [(shuffled[i], shuffled[j], cost)
+                 for i, j, cost in zip(first.tolist(), second.tolist(), pair_costs.tolist())]
+        if excluded:
+            costs = [(a, b, cost) for a, b, cost in costs if self.pair_key(a, b) not in excluded]
+        if not costs:
+            return None, None
+        
+        # 다른 후보와 겹치는 조합은 반복 비용이 같을 때만 피하도록 보조 비용으로 추가
+        # (scale이 보조 비용 합의 최댓값보다 커서 반복 비용이 항상 우선)
+        diversity = self.diversity_counts
+        if diversity:
+            scale = len(people_list) // 2 * max(diversity.values()) + 1
+            costs = [(a, b, cost * scale + diversity.get(self.pair_key(a, b), 0)) for a, b, cost in costs]
+        max_cost = max(cost for _, _, cost in costs)
+        
+        # 최대 가중치 완전 매칭 = 가중치를 반전한 최소 비용 완전 매칭
+        graph = nx.Graph()
+        graph.add_weighted_edges_from((a, b, max_cost + 1 - cost) for a, b, cost in costs)
+        matching = nx.max_weight_matching(graph, maxcardinality=True)
+        
+        if len(matching) * 2 != len(people_list):
+            return None, None
+        
+        pairs = [self.pair_key(a, b) for a, b in matching]
+        return pairs, sum(self.pair_cost(a, b, round_num) for a, b in pairs)
+    
+    def is_trio_allowed(self, trio_members, excluded=None):
+        """3명조에 금지/고정 조합(또는 주어진 제외 조합)이 없는지 확인"""
+        if excluded is None:
+            excluded = self._excluded_pairs
+        return all(self.pair_key(a, b) not in excluded for a, b in combinations(trio_members, 2))
+    
+    def repair_trio(self, people_list, trio_members, excluded=None):
+        """금지/사용된 조합이 없는 3명조로 교체
+        
+        3명조 참여가 가장 적은 사람들부터 조합을 시도해 공정성을 유지합니다.
+        (planned 멤버는 참여 횟수가 같을 때 우선)
+        """
+        trio_counts = self.trio_counts
+        planned = set(trio_members)
+        ordered = sorted(
+            people_list,
+            key=lambda p: (trio_counts.get(p, 0), p not in planned, random.random())
+        )
+        
+        for candidate in combinations(ordered, 3):
+            if self.is_trio_allowed(candidate, excluded):
+                return list(candidate)
+        return None
+    
+    def trio_cost(self, trio_members, round_num):
+        """3명조의 반복 비용 (금지/고정 조합이 있으면 None)"""
+        if not self.is_trio_allowed(trio_members):
+            return None
+        return sum(self.pair_cost(a, b, round_num) for a, b in combinations(trio_members, 2))
+    
+    def choose_min_cost_trio(self, people_list, trio_members, round_num):
+        """계획된 3명조에서 한 명씩 교체하며 반복 비용이 가장 낮은 3명조 선택
+        
+        3명조 참여 횟수가 교체 대상보다 많지 않은 사람과만 교체하므로, 참여가
+        가장 적은 사람들로 구성된 3명조는 교체 후에도 공정성이 유지됩니다.
+        """
+        best_trio = list(trio_members)
+        best_cost = self.trio_cost(best_trio, round_num)
+        if best_cost == 0:
+            return best_trio, best_cost
+        
+        # 비용이 같은 후보 중에서는 3명조 참여가 적은 사람을 우선
+        trio_counts = self.trio_counts
+        
+        # 비용이 줄어드는 교체만 받아들여 계획을 최대한 유지
+        for _ in range(3):
+            others = [p for p in people_list if p not in best_trio]
+            random.shuffle(others)
+            best_candidate = None
+            best_key = None
+            
+            for i in range(3):
+                member_count = trio_counts.get(best_trio[i], 0)
+                for other in others:
+                    if trio_counts.get(other, 0) > member_count:
+                        continue
+                    candidate = best_trio[:i] + [other] + best_trio[i + 1:]
+                    cost = self.trio_cost(candidate, round_num)
+                    if cost is None:
+                        continue
+                    candidate_key = (cost, trio_counts.get(other, 0) - trio_counts.get(best_trio[i], 0))
+                    if best_key is None or candidate_key < best_key:
+                        best_candidate, best_key = candidate, candidate_key
+            
+            if best_candidate is None or (best_cost is not None and best_key[0] >= best_cost):
+                break
+            
+            best_trio, best_cost = best_candidate, best_key[0]
+            if best_cost == 0:
+                break
+        
+        return best_trio if best_cost is not None else None, best_cost
+    
+    def construct_min_cost_arrangement(self, people_list, trio_members=None):
+        """반복 비용을 최소화하는 배치 생성 ((배치, 총 비용) 반환, 불가능하면 (None, None))"""
+        arrangement = []
+        remaining_people = people_list
+        round_num = len(self.arrangements)
+        total_cost = 0
+        
+        if trio_members and len(trio_members) == 3:
+            trio_members, total_cost = self.choose_min_cost_trio(people_list, trio_members, round_num)
+            if trio_members is None:
+                return None, None
+            
+            arrangement.append(tuple(trio_members))
+            trio_set = set(trio_members)
+            remaining_people = [p for p in people_list if p not in trio_set]
+        
+        pairs, pairs_cost = self.min_cost_pairing(remaining_people, round_num)
+        if pairs is None:
+            return None, None
+        
+        arrangement.extend(pairs)
+        return self.randomize_final_arrangement_optimized(arrangement), total_cost + pairs_cost
+    
+    def set_pair_constraints(self, people_list, target_count, forbidden_pairs=None, required_pairs=None):
+        """금지/고정 조합을 검증하고 인덱스에 등록 (오류 메시지 또는 None 반환)"""
+        people_set = set(people_list)
+        key = self.pair_key
+        
+        forbidden = set()
+        for a, b in forbidden_pairs or ():
+            if a not in people_set or b not in people_set:
+                return f"금지 조합 ({a}, {b})에 참가자 목록에 없는 사람이 있습니다."
+            if a != b:
+                forbidden.add(key(a, b))
+        
+        required = {}
+        fixed_pairs = set()
+        for round_num, pairs in (required_pairs or {}).items():
+            if not 0 <= round_num < target_count:
+                return f"고정 조합의 배치 번호 {round_num + 1}차가 생성할 배치 수를 벗어납니다."
+            
+            round_people = set()
+            round_pairs = []
+            for a, b in pairs:
+                if a not in people_set or b not in people_set or a == b:
+                    return f"고정 조합 ({a}, {b})이 올바르지 않습니다."
+                pair = key(a, b)
+                if pair in forbidden:
+                    return f"고정 조합 ({a}, {b})이 금지 조합과 충돌합니다."
+                if pair in fixed_pairs:
+                    return f"고정 조합 ({a}, {b})이 여러 배치에 중복 지정되었습니다."
+                if a in round_people or b in round_people:
+                    return f"{round_num + 1}차 배치에서 한 사람이 여러 고정 조합에 포함되었습니다."
+                round_people.update(pair)
+                round_pairs.append(pair)
+                fixed_pairs.add(pair)
+            
+            # 홀수 인원이면 고정 조합 외에 3명조를 만들 사람이 남아야 함
+            if len(people_list) % 2 != 0 and len(people_list) - 2 * len(round_pairs) < 3:
+                return f"{round_num + 1}차 배치의 고정 조합이 너무 많아 3명조를 구성할 수 없습니다."
+            
+            if round_pairs:
+                required[round_num] = round_pairs
+        
+        self.forbidden_pairs = forbidden
+        self.required_pairs = required
+        self._excluded_pairs = forbidden | fixed_pairs
+        
+        # 고정 조합을 미리 인덱스에 넣어 다른 배치의 탐색에서 자동으로 배제
+        self.blocked_pairs = PairSet(self.arrangements.name_table, self._excluded_pairs)
+        return None
+    
+    def prepare_round(self, people_list, round_num, trio_members):
+        """고정 조합을 먼저 배치하고, 탐색할 나머지 인원과 3명조를 반환"""
+        fixed_pairs = self.required_pairs.get(round_num, [])
+        round_people = people_list
+        
+        if fixed_pairs:
+            fixed_people = {p for pair in fixed_pairs for p in pair}
+            round_people = [p for p in people_list if p not in fixed_people]
+            
+            # 고정 조합에 들어간 사람은 3명조에서 빼고 다른 사람으로 채움
+            if trio_members:
+                trio_members = [p for p in trio_members if p not in fixed_people]
+                if len(trio_members) < 3:
+                    candidates = [p for p in round_people if p not in trio_members]
+                    trio_members += random.sample(candidates, 3 - len(trio_members))
+        
+        # 금지/사용된 조합이 들어간 3명조나, 앞선 교체로 참여 횟수가 앞서 나간
+        # 사람이 있는 3명조는 탐색 전에 미리 교체
+        if trio_members and len(trio_members) == 3:
+            blocked = self.blocked_pairs
+            trio_counts = self.trio_counts
+            min_count = min((trio_counts.get(p, 0) for p in round_people), default=0)
+            over_quota = any(trio_counts.get(p, 0) > min_count for p in trio_members)
+            if over_quota or not self.is_trio_allowed(trio_members, blocked):
+                # 새 조합만으로 된 3명조가 없으면(중복 최소화 구간) 금지/고정 조합만 피해
+                # 참여가 가장 적은 사람들로 구성
+                trio_members = (self.repair_trio(round_people, trio_members, blocked)
+                                or self.repair_trio(round_people, trio_members)
+                                or trio_members)
+        
+        return round_people, trio_members, fixed_pairs
+    
+    def generate_multiple_arrangements(self, people_list, target_count=5, allow_repeats=False,
+                                       forbidden_pairs=None, required_pairs=None):
+        """개선된 알고리즘으로 여러 배치 생성 (최적화)
+        
+        allow_repeats가 True이면 새 조합으로 배치를 만들 수 없을 때 멈추지 않고
+        최소 비용 완전 매칭으로 반복을 최소화하며 남은 배치를 생성합니다.
+        forbidden_pairs는 절대 짝이 되면 안 되는 조합들, required_pairs는
+        {배치 번호(0부터): [조합, ...]} 형태로 해당 배치에 반드시 넣을 조합들입니다.
+        """
+        self.reset_schedule(people_list)
+        
+        constraint_error = self.set_pair_constraints(people_list, target_count, forbidden_pairs, required_pairs)
+        if constraint_error:
+            return 0, constraint_error
+        
+        feasibility_error = self.check_feasibility(people_list, target_count, allow_repeats)
+        if feasibility_error:
+            return 0, feasibility_error
+        
+        return self.generate_rounds(people_list, target_count, allow_repeats)
+    
+    def reset_schedule(self, people_list):
+        """새 스케줄 생성을 위해 배치와 통계를 초기화"""
         self.people_list = people_list
-        self.used_pairs.clear()
-        self.arrangements.clear()
+        self.arrangements = CompactSchedule(NameTable.shared(people_list))
+        self.blocked_pairs = PairSet(self.arrangements.name_table)
+        self.pair_history = PairHistory(self.arrangements.name_table)
+        self.repeat_from_round = None
         self._available_pairs_cache = None
-        
-        # 빠른 실행 가능성 검사
-        total_possible = len(people_list) * (len(people_list) - 1) // 2
+        self._reserved_pairs = set()
+        self.reset_statistics(people_list)
+    
+    def check_feasibility(self, people_list, target_count, allow_repeats=False):
+        """빠른 실행 가능성 검사 (불가능하면 오류 메시지 반환)"""
+        total_possible = len(people_list) * (len(people_list) - 1) // 2 - len(self.forbidden_pairs)
         needed_pairs = target_count * (len(people_list) // 2)
         
-        if needed_pairs > total_possible:
-            return 0, "요청한 배치 수가 수학적으로 불가능합니다."
+        if needed_pairs > total_possible and not allow_repeats:
+            return "요청한 배치 수가 수학적으로 불가능합니다."
+        return None
+    
+    def generate_rounds(self, people_list, target_count, allow_repeats=False):
+        """제약 인덱스가 준비된 상태에서 배치들을 생성 ((생성 수, 메시지) 반환)"""
+        # 제약이 없으면 캐시된 템플릿을 재라벨링하는 것만으로 생성
+        # (재라벨링은 구조가 같아 다른 후보와 많이 겹치므로 첫 후보에만 사용)
+        if (self.template_library is not None and not self.forbidden_pairs and not self.required_pairs
+                and not self.diversity_counts):
+            if self.apply_template(people_list, target_count):
+                return target_count, None
         
         # 3명조 계획 수립
         trio_plan = self.plan_trio_distribution(people_list, target_count)
@@ -298,36 +1098,173 @@ class OptimizedPairMaker:
         for round_num in range(target_count):
             trio_members = trio_plan[round_num] if round_num < len(trio_plan) else None
             
+            # 새 조합만 쓰는 동안에는 뒤 배치의 3명조 조합을 2명조로 써 버리지 않도록 예약
+            if trio_plan and not allow_repeats:
+                self.reserve_trio_pairs(trio_plan[round_num + 1:])
+            
+            # 고정 조합을 먼저 확정해 탐색 문제를 줄임
+            round_people, trio_members, fixed_pairs = self.prepare_round(people_list, round_num, trio_members)
+            
+            # 중복 허용 시에는 무작위 재시도 없이 매 배치를 다항 시간 매칭으로 생성
+            if allow_repeats:
+                arrangement, cost = self.construct_min_cost_arrangement(round_people, trio_members)
+                if arrangement is None:
+                    error_message = f"총 {successful_count}개의 배치만 생성 가능합니다. (금지 조합 때문에 완전 매칭이 존재하지 않음)"
+                    return successful_count, error_message
+                
+                # 비용이 0보다 크면 새 조합만으로는 배치할 수 없다는 뜻
+                if cost > 0 and self.repeat_from_round is None:
+                    self.repeat_from_round = round_num
+                
+                self.add_arrangement(self.merge_fixed_pairs(arrangement, fixed_pairs))
+                successful_count += 1
+                continue
+            
             # 적응적 시도 횟수 (성공률에 따라 조정)
             max_attempts = min(50 + round_num * 10, 200)
             arrangement = None
+            best_overlap = None
+            valid_count = 0
             
             for attempt in range(max_attempts):
                 # 3명조 적응적 변경
                 current_trio = trio_members
                 if trio_members and attempt > 0:
                     if attempt % 20 == 0:  # 20회마다 변경
-                        current_trio = self.adjust_trio_members(people_list, trio_members, attempt)
+                        current_trio = self.adjust_trio_members(round_people, trio_members, attempt)
                 
                 # 랜덤 시작점 (덜 격렬하게)
-                shuffled_people = people_list.copy()
+                shuffled_people = round_people.copy()
                 if attempt > 0:
                     random.shuffle(shuffled_people)
                 
-                arrangement = self.construct_arrangement_with_constraints(shuffled_people, current_trio)
+                candidate = self.construct_arrangement_with_constraints(shuffled_people, current_trio)
+                if not candidate or not self.is_arrangement_valid(candidate):
+                    continue
+                if not self.diversity_counts:
+                    arrangement = candidate
+                    break
                 
-                if arrangement and self.is_arrangement_valid(arrangement):
+                # 후보 다양화 중이면 유효 배치 몇 개 중 앞선 후보들과 가장 덜 겹치는 것 사용
+                overlap = self.diversity_overlap(candidate)
+                if best_overlap is None or overlap < best_overlap:
+                    arrangement, best_overlap = candidate, overlap
+                valid_count += 1
+                if overlap == 0 or valid_count >= DIVERSE_ROUND_SAMPLES:
                     break
             
+            released = False
+            if arrangement is None:
+                # 무작위 탐색이 실패해도 새 조합만으로 된 완전 매칭이 있으면 사용
+                arrangement, cost = self.construct_min_cost_arrangement(round_people, trio_members)
+                if (arrangement is None or cost) and self._reserved_pairs:
+                    # 뒤 배치의 3명조 예약 때문에 막혔으면 예약을 풀고 다시 시도
+                    self.reserve_trio_pairs([])
+                    released = True
+                    arrangement, cost = self.construct_min_cost_arrangement(round_people, trio_members)
+                if cost:
+                    arrangement = None
+            
             if arrangement:
-                self.add_arrangement(arrangement)
+                self.add_arrangement(self.merge_fixed_pairs(arrangement, fixed_pairs))
                 successful_count += 1
+                
+                # 계획과 다른 3명조를 썼으면 남은 배치의 3명조를 현재 참여 횟수로 다시 계획
+                used_trio = [set(group) for group in arrangement if len(group) == 3]
+                if trio_members and (released or used_trio != [set(trio_members)]):
+                    self.reserve_trio_pairs([])
+                    trio_plan[round_num + 1:] = self.plan_trio_distribution(
+                        people_list, target_count - round_num - 1
+                    )
             else:
                 error_message = f"총 {successful_count}개의 배치만 생성 가능합니다. (제약 조건을 만족하는 추가 배치를 찾을 수 없음)"
                 return successful_count, error_message
         
+        if self.repeat_from_round is not None:
+            notice = f"{self.repeat_from_round + 1}차 배치부터는 새로운 조합이 부족하여 중복을 최소화한 조합으로 생성했습니다."
+            return successful_count, notice
+        
         return successful_count, None
     
+    def apply_template(self, people_list, target_count):
+        """템플릿 라이브러리의 라운드들을 무작위 재라벨링해 배치로 추가 (성공 여부 반환)"""
+        template = self.template_library.get_template(len(people_list), target_count)
+        if template is None:
+            return False
+        
+        # 사람 ↔ 슬롯 무작위 대응 + 라운드 순서 섞기
+        labels = people_list.copy()
+        random.shuffle(labels)
+        rounds = random.sample(template, target_count)
+        
+        for round_groups in rounds:
+            arrangement = [tuple(labels[slot] for slot in group) for group in round_groups]
+            self.add_arrangement(self.randomize_final_arrangement_optimized(arrangement))
+        
+        return True
+    
+    def generate_diverse_candidates(self, people_list, target_count=5, candidate_count=3,
+                                    allow_repeats=False, forbidden_pairs=None, required_pairs=None):
+        """서로 겹치는 조합이 적은 후보 스케줄 여러 개를 한 번에 생성
+        
+        제약 검증과 금지/고정 조합 인덱스는 한 번만 만들어 모든 후보가 공유하고,
+        다음 후보는 기존 무작위 탐색에서 앞선 후보들과 덜 겹치는 짝부터 고르고,
+        배치마다 유효 배치 몇 개 중 겹침이 가장 적은 것을 씁니다. 탐색이 실패하면
+        겹침을 보조 비용으로 둔 최소 비용 매칭으로 넘어갑니다.
+        [(후보 pair_maker, 생성 수, 메시지), ...]를 반환하며, 제약이 잘못되었거나
+        실행 불가능하면 [(self, 0, 오류 메시지)]를 반환합니다.
+        """
+        self.reset_schedule(people_list)
+        constraint_error = self.set_pair_constraints(people_list, target_count, forbidden_pairs, required_pairs)
+        if not constraint_error:
+            constraint_error = self.check_feasibility(people_list, target_count, allow_repeats)
+        if constraint_error:
+            return [(self, 0, constraint_error)]
+        
+        diversity_counts = {}
+        candidates = []
+        for _ in range(candidate_count):
+            candidate = type(self)(template_library=self.template_library)
+            candidate.reset_schedule(people_list)
+            
+            # 검증된 제약 인덱스 공유 (탐색 중 바뀌는 blocked_pairs만 후보별로 복사)
+            candidate.forbidden_pairs = self.forbidden_pairs
+            candidate.required_pairs = self.required_pairs
+            candidate._excluded_pairs = self._excluded_pairs
+            candidate.blocked_pairs = PairSet(candidate.arrangements.name_table, self._excluded_pairs)
+            candidate.diversity_counts = diversity_counts
+            
+            successful_count, message = candidate.generate_rounds(people_list, target_count, allow_repeats)
+            candidates.append((candidate, successful_count, message))
+            
+            for pair in candidate.pair_history:
+                diversity_counts[pair] = diversity_counts.get(pair, 0) + 1
+        
+        # 생성이 끝난 후보는 이후 조회에 영향이 없도록 공유 카운터와 분리
+        for candidate, _, _ in candidates:
+            candidate.diversity_counts = {}
+        return candidates
+    
+    def diversity_overlap(self, arrangement):
+        """배치의 조합들이 앞서 만든 후보들에서 사용된 횟수 합"""
+        diversity = self.diversity_counts
+        key = self.pair_key
+        return sum(diversity.get(key(a, b), 0)
+                   for group in arrangement for a, b in combinations(group, 2))
+    
+    def shared_pair_ratio(self, other):
+        """두 스케줄이 함께 사용한 조합의 비율 (0~1, 이 스케줄의 조합 기준)"""
+        if not self.pair_history:
+            return 0.0
+        other_pairs = other.pair_history
+        return sum(pair in other_pairs for pair in self.pair_history) / len(self.pair_history)
+    
+    def merge_fixed_pairs(self, arrangement, fixed_pairs):
+        """탐색으로 만든 배치에 고정 조합을 합쳐 최종 배치 구성"""
+        if not fixed_pairs:
+            return arrangement
+        return self.randomize_final_arrangement_optimized(arrangement + list(fixed_pairs))
+    
     def adjust_trio_members(self, people_list, original_trio, attempt):
         """3명조 멤버를 적응적으로 조정"""
         if not original_trio or len(original_trio) != 3:
@@ -339,8 +1276,11 @@ class OptimizedPairMaker:
         current_trio = original_trio.copy()
         for _ in range(change_intensity):
             if random.random() < 0.3:  # 30% 확률로 변경
+                # 3명조 참여가 더 많은 사람으로는 바꾸지 않음 (공정성 유지)
                 old_member = random.choice(current_trio)
-                other_people = [p for p in people_list if p not in current_trio]
+                old_count = self.trio_counts.get(old_member, 0)
+                other_people = [p for p in people_list
+                                if p not in current_trio and self.trio_counts.get(p, 0) <= old_count]
                 if other_people:
                     new_member = random.choice(other_people)
                     current_trio.remove(old_member)
@@ -349,19 +1289,16 @@ class OptimizedPairMaker:
         return current_trio
     
     def get_trio_fairness_stats(self, people_list):
-        """3명조 배치의 공정성 통계를 계산"""
+        """3명조 배치의 공정성 통계 (점진 통계에서 바로 조회, 결과 캐시)"""
         if len(people_list) % 2 == 0:
             return None
         
-        trio_counts = defaultdict(int)
-        
-        for arrangement in self.arrangements:
-            for group in arrangement:
-                if len(group) == 3:
-                    for person in group:
-                        trio_counts[person] += 1
+        cache_key = ("trio", tuple(people_list))
+        cached = self._stats_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        total_trios = len(self.arrangements)
+        total_trios = self.trio_round_count
         total_trio_positions = total_trios * 3
         people_count = len(people_list)
         
@@ -369,19 +1306,97 @@ class OptimizedPairMaker:
         min_optimal = int(optimal_per_person)
         max_optimal = min_optimal + 1
         
-        actual_counts = {person: trio_counts.get(person, 0) for person in people_list}
-        min_actual = min(actual_counts.values()) if actual_counts else 0
-        max_actual = max(actual_counts.values()) if actual_counts else 0
+        if people_list == self.people_list and len(self.trio_counts) == people_count:
+            # 참가자가 그대로면 히스토그램으로 최소/최대를 바로 구함
+            actual_counts = self.trio_counts
+            min_actual = min(self._trio_count_hist) if self._trio_count_hist else 0
+            max_actual = max(self._trio_count_hist) if self._trio_count_hist else 0
+        else:
+            actual_counts = {person: self.trio_counts.get(person, 0) for person in people_list}
+            min_actual = min(actual_counts.values()) if actual_counts else 0
+            max_actual = max(actual_counts.values()) if actual_counts else 0
         
-        return {
+        stats = {
             "total_trios": total_trios,
             "optimal_min": min_optimal,
             "optimal_max": max_optimal,
             "actual_min": min_actual,
             "actual_max": max_actual,
-            "actual_counts": actual_counts,
+            "actual_counts": dict(actual_counts),
             "is_fair": (max_actual - min_actual) <= 1
         }
+        self._stats_cache[cache_key] = stats
+        return stats
+    
+    def get_usage_stats(self, people_list):
+        """조합 사용률과 파트너 커버리지 통계 (점진 통계에서 바로 조회, 결과 캐시)"""
+        cache_key = ("usage", len(people_list))
+        cached = self._stats_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        people_count = len(people_list)
+        total_possible = people_count * (people_count - 1) // 2
+        used_pairs = len(self.used_pairs)
+        coverage = dict(sorted(self._partner_count_hist.items()))
+        
+        stats = {
+            "arrangement_count": len(self.arrangements),
+            "total_possible": total_possible,
+            "used_pairs": used_pairs,
+            "usage_rate": used_pairs / total_possible * 100 if total_possible else 0.0,
+            "total_meetings": self.total_meetings,
+            "repeated_meetings": self.total_meetings - len(self.pair_history),
+            # 만나본 사람 수 → 해당 인원 수
+            "coverage_distribution": coverage,
+            "min_partners": min(coverage) if coverage else 0,
+            "max_partners": max(coverage) if coverage else 0,
+            "mean_partners": (sum(k * v for k, v in coverage.items()) / sum(coverage.values())) if coverage else 0.0,
+            "round_summaries": self.round_summaries,
+        }
+        self._stats_cache[cache_key] = stats
+        return stats
+    
+    def iter_export_rows(self):
+        """내보내기용 행을 배치 순서대로 하나씩 생성 (세번째 자리가 없으면 None)"""
+        for i, j, group in self.arrangements.iter_groups():
+            third = group[2] if len(group) == 3 else None
+            yield f"{i+1}차", f"{j+1}조", group[0], group[1], third
+    
+    def export_csv(self, fp):
+        """전체 배치를 CSV로 스트리밍 저장 (fp는 텍스트 파일 객체)"""
+        writer = csv.writer(fp)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in self.iter_export_rows():
+            writer.writerow(row[:4] + ("" if row[4] is None else row[4],))
+    
+    def export_jsonl(self, fp):
+        """전체 배치를 JSON Lines로 스트리밍 저장 (한 줄에 한 조)"""
+        for row in self.iter_export_rows():
+            fp.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False))
+            fp.write("\n")
+    
+    def export_parquet(self, path, batch_rows=65536):
+        """전체 배치를 Parquet로 저장 (pyarrow 필요, batch_rows 단위로 나눠 기록)"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet 내보내기에는 pyarrow가 필요합니다: pip install pyarrow") from e
+        
+        # 숫자 모드와 이름 모드를 같은 스키마로 저장하도록 이름은 문자열로 통일
+        schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+        columns = [[] for _ in EXPORT_COLUMNS]
+        
+        with pq.ParquetWriter(path, schema) as writer:
+            for row in self.iter_export_rows():
+                for column, value in zip(columns, row):
+                    column.append(None if value is None else str(value))
+                if len(columns[0]) >= batch_rows:
+                    writer.write_table(pa.table(columns, schema=schema))
+                    columns = [[] for _ in EXPORT_COLUMNS]
+            if columns[0] or not self.arrangements:
+                writer.write_table(pa.table(columns, schema=schema))
     
     def format_pairs_as_table(self, arrangement_idx):
         """짝을 테이블 형태로 포맷"""
@@ -425,10 +1440,254 @@ class OptimizedPairMaker:
         
         lines.append("")
         lines.append(f"📅 생성일시: {datetime.now().strftime('%Y.%m.%d %H:%M')}")
-        lines.append("💡 모든 짝은 중복되지 않습니다!")
+        if self.repeat_from_round is not None and arrangement_idx >= self.repeat_from_round:
+            lines.append("💡 새로운 조합이 부족하여 중복을 최소화한 짝입니다!")
+        else:
+            lines.append("💡 모든 짝은 중복되지 않습니다!")
         
         return "\n".join(lines)
 
+TEMPLATE_CACHE_VERSION = 1
+
+class TemplateLibrary:
+    """(인원 수, 조 크기)별 1-factorization 라운드 템플릿을 디스크에 캐시
+    
+    템플릿은 0..n-1 슬롯 번호로 된 라운드 목록이며, 실제 배치는 슬롯에 사람을
+    무작위로 대응시켜 만듭니다. 파일은 여러 프로세스가 공유하므로 쓸 때마다
+    최신 내용과 병합한 뒤 원자적으로 교체합니다.
+    """
+    
+    def __init__(self, path=None):
+        if path is None:
+            path = os.environ.get("PAIRMAKER_TEMPLATE_CACHE") or os.path.join(
+                os.path.expanduser("~"), ".cache", "pairmaker", f"templates-v{TEMPLATE_CACHE_VERSION}.json"
+            )
+        self.path = path
+        self._templates = None  # "n:조크기" → {라운드 수: 평탄화된 라운드 목록}
+        self._failed = set()  # 만들 수 없었던 (키, 배치 수) (프로세스 메모리에만 기록)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def round_robin_rounds(people_count):
+        """짝수 인원의 원형(circle) 방식 1-factorization (n-1개 라운드)"""
+        others = list(range(1, people_count))
+        rounds = []
+        for _ in range(people_count - 1):
+            circle = [0] + others
+            rounds.append([(circle[i], circle[people_count - 1 - i]) for i in range(people_count // 2)])
+            others = others[-1:] + others[:-1]
+        return rounds
+    
+    @staticmethod
+    def encode_round(round_groups):
+        """라운드를 평탄한 슬롯 번호 목록으로 변환 (2명조들 다음에 3명조)"""
+        pairs = [group for group in round_groups if len(group) == 2]
+        trios = [group for group in round_groups if len(group) == 3]
+        return [slot for group in pairs + trios for slot in group]
+    
+    @staticmethod
+    def decode_round(flat_round):
+        """평탄한 슬롯 번호 목록을 2명조/3명조 라운드로 복원"""
+        pair_end = len(flat_round) - 3 if len(flat_round) % 2 else len(flat_round)
+        groups = [tuple(flat_round[i:i + 2]) for i in range(0, pair_end, 2)]
+        if pair_end < len(flat_round):
+            groups.append(tuple(flat_round[pair_end:]))
+        return groups
+    
+    def _read_file(self):
+        """캐시 파일을 읽음 (없거나 버전이 다르거나 깨졌으면 빈 캐시)"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != TEMPLATE_CACHE_VERSION:
+            return {}
+        return data.get("templates", {})
+    
+    def _write_file(self, key, round_count, flat_rounds):
+        """다른 프로세스가 쓴 내용과 병합한 뒤 임시 파일 → 원자적 교체로 저장"""
+        templates = self._read_file()
+        templates.setdefault(key, {})[str(round_count)] = flat_rounds
+        
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": TEMPLATE_CACHE_VERSION, "templates": templates}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return templates  # 저장 실패는 메모리 캐시로만 사용
+        return templates
+    
+    def build_template(self, people_count, target_count):
+        """템플릿을 새로 계산 ((저장할 라운드 수, 라운드 목록) 또는 None)"""
+        if people_count % 2 == 0:
+            # 짝수는 완전한 1-factorization 하나로 모든 배치 수를 처리
+            return people_count - 1, self.round_robin_rounds(people_count)
+        
+        # 홀수는 3명조 공정성이 배치 수에 따라 달라지므로 배치 수별로 탐색
+        pair_maker = OptimizedPairMaker()
+        slots = list(range(people_count))
+        successful_count, _ = pair_maker.generate_multiple_arrangements(slots, target_count)
+        stats = pair_maker.get_trio_fairness_stats(slots)
+        if successful_count != target_count or not stats["is_fair"]:
+            return None
+        return target_count, pair_maker.arrangements
+    
+    def get_template(self, people_count, target_count, group_size=2):
+        """target_count개 이상의 라운드 템플릿을 반환 (만들 수 없으면 None)"""
+        if group_size != 2 or people_count < 2 or target_count < 1:
+            return None
+        
+        # 짝수 인원의 1-factorization은 n-1 라운드가 최대라 더 긴 템플릿은 만들 수 없음
+        if people_count % 2 == 0 and target_count > people_count - 1:
+            return None
+        
+        key = f"{people_count}:{group_size}"
+        with self._lock:
+            if self._templates is None:
+                self._templates = self._read_file()
+            
+            template = self._find(key, people_count, target_count)
+            if template is not None:
+                return template
+            if (key, target_count) in self._failed:
+                return None
+            
+            # 다른 프로세스가 그 사이에 만들었을 수 있으므로 파일을 다시 확인
+            self._templates = self._read_file()
+            template = self._find(key, people_count, target_count)
+            if template is not None:
+                return template
+        
+        # 홀수 인원은 생성에 시간이 걸리므로 잠금 밖에서 계산 (다른 세션의 조회를 막지 않음)
+        built = self.build_template(people_count, target_count)
+        
+        with self._lock:
+            if built is None:
+                self._failed.add((key, target_count))
+                return None
+            
+            round_count, rounds = built
+            flat_rounds = [self.encode_round(round_groups) for round_groups in rounds]
+            self._templates = self._write_file(key, round_count, flat_rounds)
+            return self._find(key, people_count, target_count)
+    
+    def _find(self, key, people_count, target_count):
+        """캐시에서 사용할 수 있는 템플릿 검색 (짝수는 더 긴 템플릿의 일부도 사용)"""
+        entry = self._templates.get(key, {})
+        if people_count % 2 == 0:
+            candidates = [int(count) for count in entry if int(count) >= target_count]
+            if not candidates:
+                return None
+            flat_rounds = entry[str(min(candidates))]
+        else:
+            flat_rounds = entry.get(str(target_count))
+            if flat_rounds is None:
+                return None
+        return [self.decode_round(flat_round) for flat_round in flat_rounds]
+
+def parse_pair_lines(text, people_list, with_round=False):
+    """'이름1, 이름2' 형식의 줄들을 조합 목록으로 변환 (고정 조합은 '차수: 이름1, 이름2')"""
+    lookup = {str(person): person for person in people_list}
+    pairs = defaultdict(list) if with_round else []
+    
+    for line_no, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        
+        if with_round:
+            round_text, separator, line = line.partition(":")
+            round_text = round_text.strip().rstrip("차").strip()
+            if not separator or not round_text.isdigit():
+                return None, f"{line_no}번째 줄: '차수: 이름1, 이름2' 형식으로 입력하세요."
+        
+        names = [name.strip() for name in line.split(",")]
+        if len(names) != 2 or any(name not in lookup for name in names):
+            return None, f"{line_no}번째 줄: 참가자 이름 두 개를 쉼표로 구분해 입력하세요."
+        
+        pair = (lookup[names[0]], lookup[names[1]])
+        if with_round:
+            pairs[int(round_text) - 1].append(pair)
+        else:
+            pairs.append(pair)
+    
+    return (dict(pairs) if with_round else pairs), None
+
+class ScheduleStore:
+    """생성된 스케줄을 id로 보관하는 공유 저장소 (오래된 것부터 제거하는 LRU)
+    
+    세션에는 짧은 스케줄 id만 두고 실제 배치는 여기서 조회하므로, 동시 사용자가
+    늘어도 세션별 메모리가 일정하게 유지됩니다.
+    """
+    
+    def __init__(self, max_schedules=200):
+        self.max_schedules = max_schedules
+        self._schedules = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def put(self, pair_maker):
+        """스케줄을 저장하고 새 id를 반환"""
+        schedule_id = uuid.uuid4().hex
+        with self._lock:
+            self._schedules[schedule_id] = pair_maker
+            while len(self._schedules) > self.max_schedules:
+                self._schedules.popitem(last=False)
+        return schedule_id
+    
+    def get(self, schedule_id):
+        """id로 스케줄 조회 (없거나 밀려났으면 None)"""
+        with self._lock:
+            pair_maker = self._schedules.get(schedule_id)
+            if pair_maker is not None:
+                self._schedules.move_to_end(schedule_id)
+            return pair_maker
+    
+    def __len__(self):
+        return len(self._schedules)
+
+def parse_people_text(text):
+    """줄바꿈/쉼표로 구분된 이름 목록을 파싱 (빈 값 제거, 중복은 따로 반환)"""
+    people_list = []
+    seen = set()
+    duplicates = []
+    for line in text.splitlines():
+        for name in line.split(","):
+            name = name.strip()
+            if not name:
+                continue
+            if name in seen:
+                duplicates.append(name)
+                continue
+            seen.add(name)
+            people_list.append(name)
+    return people_list, duplicates
+
+@st.cache_resource
+def get_template_library():
+    """모든 세션이 공유하는 템플릿 라이브러리"""
+    return TemplateLibrary()
+
+@st.cache_resource
+def get_schedule_store():
+    """모든 세션이 공유하는 스케줄 저장소"""
+    return ScheduleStore()
+
+@st.cache_data(max_entries=1000)
+def cached_table(schedule_id, arrangement_idx):
+    """(스케줄 id, 배치 번호)별 표 형태 결과 캐시"""
+    pair_maker = get_schedule_store().get(schedule_id)
+    return pair_maker.format_pairs_as_table(arrangement_idx) if pair_maker else None
+
+@st.cache_data(max_entries=1000)
+def cached_text(schedule_id, arrangement_idx):
+    """(스케줄 id, 배치 번호)별 카톡 복사용 텍스트 캐시"""
+    pair_maker = get_schedule_store().get(schedule_id)
+    return pair_maker.format_pairs_as_text(arrangement_idx) if pair_maker else ""
+
 def main():
     st.set_page_config(
         page_title="짝교제 매칭 시스템",
@@ -474,8 +1733,11 @@ def main():
     st.info("💡 전역 계획 수립 → 구성적 생성 → 스마트 백트래킹으로 더 나은 결과를 보장합니다!")
     
     # 세션 상태 초기화
-    if 'pair_maker' not in st.session_state:
-        st.session_state.pair_maker = OptimizedPairMaker()
+    # 세션에는 스케줄 id만 저장 (실제 배치는 공유 저장소에 있음)
+    if 'schedule_id' not in st.session_state:
+        st.session_state.schedule_id = None
+    if 'candidate_ids' not in st.session_state:
+        st.session_state.candidate_ids = []
     if 'people_list' not in st.session_state:
         st.session_state.people_list = [""]
     if 'arrangements_generated' not in st.session_state:
@@ -489,7 +1751,7 @@ def main():
     # 모드 선택
     mode = st.sidebar.radio(
         "입력 모드 선택",
-        ["📝 이름 입력 모드", "🔢 숫자 모드"]
+        ["📝 이름 입력 모드", "📋 일괄 입력 모드", "🔢 숫자 모드"]
     )
     
     # 생성할 배치 수
@@ -501,6 +1763,35 @@ def main():
         help="최적화된 알고리즘으로 더 많은 배치 생성이 가능합니다."
     )
     
+    # 중복 최소화 모드
+    allow_repeats = st.sidebar.checkbox(
+        "새 조합 부족 시 중복 최소화",
+        help="새로운 짝이 바닥나면 멈추지 않고, 적게 그리고 오래전에 만난 짝 위주로 계속 배치합니다"
+    )
+    
+    # 한 번에 만들 후보 스케줄 수
+    candidate_count = st.sidebar.number_input(
+        "후보 수",
+        min_value=1,
+        max_value=5,
+        value=1,
+        step=1,
+        help="2 이상이면 서로 겹치는 짝이 적은 후보들을 한 번에 만들어 비교할 수 있습니다"
+    )
+    
+    # 조합 제약 (금지/고정)
+    with st.sidebar.expander("🚫 조합 제약"):
+        forbidden_text = st.text_area(
+            "금지 조합",
+            placeholder="철수, 영희\n민수, 지수",
+            help="한 줄에 한 조합씩, 절대 짝이 되면 안 되는 두 사람을 쉼표로 구분해 입력하세요"
+        )
+        required_text = st.text_area(
+            "고정 조합",
+            placeholder="1: 철수, 민수\n3: 영희, 지수",
+            help="'차수: 이름1, 이름2' 형식으로, 해당 차수에 반드시 짝이 될 두 사람을 입력하세요"
+        )
+    
     # 랜덤 시드 설정
     if st.sidebar.checkbox("고정된 결과 사용", help="체크하면 같은 입력에 대해 항상 같은 결과가 나옵니다"):
         random.seed(42)
@@ -560,6 +1851,19 @@ def main():
             # 빈 이름 제거 (마지막 빈 칸은 유지)
             people_list = [name.strip() for name in st.session_state.people_list if name.strip()]
             
+        elif mode == "📋 일괄 입력 모드":
+            st.subheader("이름 목록을 붙여넣으세요")
+            st.caption("💡 한 줄에 한 명씩, 또는 쉼표로 구분해서 한 번에 입력할 수 있습니다!")
+            
+            people_text = st.text_area(
+                "참가자 목록",
+                height=240,
+                placeholder="철수\n영희\n민수, 지수"
+            )
+            people_list, duplicates = parse_people_text(people_text)
+            if duplicates:
+                st.warning(f"중복된 이름은 한 번만 사용됩니다: {', '.join(duplicates)}")
+            
         else:  # 숫자 모드
             st.subheader("참가자 수를 입력하세요")
             num_people = st.number_input(
@@ -594,28 +1898,72 @@ def main():
             
             # 생성 버튼
             if st.button("🎯 짝 매칭 생성!", type="primary", use_container_width=True):
-                with st.spinner("최적화된 알고리즘으로 매칭하는 중..."):
-                    pair_maker = OptimizedPairMaker()
-                    successful_count, error_message = pair_maker.generate_multiple_arrangements(
-                        people_list, target_count
-                    )
-                    
-                    st.session_state.pair_maker = pair_maker
-                    st.session_state.arrangements_generated = True
-                    
-                    if error_message:
-                        st.warning(error_message)
-                    
-                    st.success(f"✅ {successful_count}개의 배치가 생성되었습니다!")
+                forbidden_pairs, forbidden_error = parse_pair_lines(forbidden_text, people_list)
+                required_pairs, required_error = parse_pair_lines(required_text, people_list, with_round=True)
+                
+                if forbidden_error or required_error:
+                    st.error(f"조합 제약 입력 오류 - {forbidden_error or required_error}")
+                else:
+                    with st.spinner("최적화된 알고리즘으로 매칭하는 중..."):
+                        pair_maker = OptimizedPairMaker(template_library=get_template_library())
+                        if candidate_count > 1:
+                            candidates = pair_maker.generate_diverse_candidates(
+                                people_list, target_count, candidate_count, allow_repeats=allow_repeats,
+                                forbidden_pairs=forbidden_pairs, required_pairs=required_pairs
+                            )
+                        else:
+                            candidates = [(pair_maker, *pair_maker.generate_multiple_arrangements(
+                                people_list, target_count, allow_repeats=allow_repeats,
+                                forbidden_pairs=forbidden_pairs, required_pairs=required_pairs
+                            ))]
+                        
+                        # 첫 번째 후보를 기본으로 보여주고 나머지는 결과 영역에서 선택
+                        pair_maker, successful_count, error_message = candidates[0]
+                        store = get_schedule_store()
+                        st.session_state.candidate_ids = [store.put(candidate) for candidate, _, _ in candidates]
+                        st.session_state.schedule_id = st.session_state.candidate_ids[0]
+                        st.session_state.arrangements_generated = True
+                        
+                        if error_message:
+                            st.warning(error_message)
+                        
+                        st.success(f"✅ {successful_count}개의 배치가 생성되었습니다!")
         else:
             st.info("최소 2명 이상의 참가자가 필요합니다!")
     
     with col2:
         st.header("📋 매칭 결과")
         
-        if st.session_state.arrangements_generated and st.session_state.pair_maker.arrangements:
+        # 후보가 여러 개면 비교해서 고를 수 있도록 선택지 표시
+        candidate_ids = st.session_state.candidate_ids
+        if st.session_state.arrangements_generated and len(candidate_ids) > 1:
+            selected_candidate = st.radio(
+                "후보 선택",
+                range(len(candidate_ids)),
+                format_func=lambda x: f"후보 {x + 1}",
+                horizontal=True
+            )
+            st.session_state.schedule_id = candidate_ids[selected_candidate]
+        
+        schedule_id = st.session_state.schedule_id
+        pair_maker = get_schedule_store().get(schedule_id) if schedule_id else None
+        
+        if st.session_state.arrangements_generated and pair_maker is None:
+            st.info("저장된 결과가 만료되었습니다. '짝 매칭 생성!' 버튼을 다시 눌러주세요.")
+        elif st.session_state.arrangements_generated and pair_maker.arrangements:
+            # 통계는 현재 입력이 아니라 결과를 만든 참가자 목록 기준
+            schedule_people = pair_maker.people_list
+            
+            # 다른 후보와 겹치는 짝 비율
+            if len(candidate_ids) > 1:
+                store = get_schedule_store()
+                others = [store.get(other_id) for other_id in candidate_ids if other_id != schedule_id]
+                overlaps = [pair_maker.shared_pair_ratio(other) * 100 for other in others if other is not None]
+                if overlaps:
+                    st.caption(f"🔀 다른 후보와 겹치는 짝: 평균 {sum(overlaps) / len(overlaps):.1f}%")
+            
             # 3명조 공정성 통계 표시 (홀수 인원인 경우)
-            fairness_stats = st.session_state.pair_maker.get_trio_fairness_stats(people_list)
+            fairness_stats = pair_maker.get_trio_fairness_stats(schedule_people)
             if fairness_stats:
                 st.subheader("⚖️ 3명조 배치 공정성")
                 
@@ -642,7 +1990,7 @@ def main():
                     st.dataframe(pd.DataFrame(fairness_data), hide_index=True)
             
             # 배치 선택 (선택 불가능하게 처리)
-            arrangement_options = [f"{i+1}차 매칭" for i in range(len(st.session_state.pair_maker.arrangements))]
+            arrangement_options = [f"{i+1}차 매칭" for i in range(len(pair_maker.arrangements))]
             
             st.markdown('<div style="-webkit-user-select: none; -moz-user-select: none; -ms-user-select: none; user-select: none;">', unsafe_allow_html=True)
             selected_arrangement = st.selectbox(
@@ -654,12 +2002,12 @@ def main():
             
             # 테이블 형태 출력
             st.subheader(f"📊 {arrangement_options[selected_arrangement]} - 표 형태")
-            df = st.session_state.pair_maker.format_pairs_as_table(selected_arrangement)
+            df = cached_table(schedule_id, selected_arrangement)
             st.dataframe(df, use_container_width=True, hide_index=True)
             
             # 텍스트 형태 출력 (복사용) - 읽기 전용으로 변경
             st.subheader(f"📱 {arrangement_options[selected_arrangement]} - 카톡 복사용")
-            text_output = st.session_state.pair_maker.format_pairs_as_text(selected_arrangement)
+            text_output = cached_text(schedule_id, selected_arrangement)
             
             # 복사 버튼과 함께 코드 블록으로 표시 (선택 불가능)
             st.markdown("**아래 텍스트를 복사해서 사용하세요:**")
@@ -672,55 +2020,63 @@ def main():
             # 코드 블록으로 표시 (자동 복사 기능)
             st.code(text_output, language=None)
             
-            # 통계 정보
+            # 통계 정보 (점진 통계라 위젯 조작마다 재계산하지 않음)
             st.subheader("📈 통계 정보")
-            total_pairs = len(st.session_state.pair_maker.used_pairs)
-            total_possible = len(people_list) * (len(people_list) - 1) // 2
+            usage_stats = pair_maker.get_usage_stats(schedule_people)
             
-            col_stat1, col_stat2, col_stat3 = st.columns(3)
+            col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
             with col_stat1:
                 st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-                st.metric("생성된 배치 수", len(st.session_state.pair_maker.arrangements))
+                st.metric("생성된 배치 수", usage_stats['arrangement_count'])
                 st.markdown('</div>', unsafe_allow_html=True)
             with col_stat2:
                 st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-                st.metric("사용된 2명 조합 수", total_pairs)
+                st.metric("사용된 2명 조합 수", usage_stats['used_pairs'])
                 st.markdown('</div>', unsafe_allow_html=True)
             with col_stat3:
                 st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-                st.metric("사용률", f"{(total_pairs/total_possible)*100:.1f}%")
+                st.metric("사용률", f"{usage_stats['usage_rate']:.1f}%")
+                st.markdown('</div>', unsafe_allow_html=True)
+            with col_stat4:
+                st.markdown('<div class="metric-container">', unsafe_allow_html=True)
+                st.metric("평균 만난 사람 수", f"{usage_stats['mean_partners']:.1f}명")
                 st.markdown('</div>', unsafe_allow_html=True)
             
-            # 전체 배치 다운로드
-            if st.button("📥 전체 결과 다운로드 (CSV)", use_container_width=True):
-                all_data = []
-                for i, pairs in enumerate(st.session_state.pair_maker.arrangements):
-                    for j, group in enumerate(pairs):
-                        if len(group) == 2:
-                            all_data.append({
-                                "배치차수": f"{i+1}차",
-                                "조": f"{j+1}조",
-                                "첫번째": group[0],
-                                "두번째": group[1],
-                                "세번째": ""
-                            })
-                        elif len(group) == 3:
-                            all_data.append({
-                                "배치차수": f"{i+1}차",
-                                "조": f"{j+1}조",
-                                "첫번째": group[0],
-                                "두번째": group[1],
-                                "세번째": group[2]
-                            })
+            with st.expander("만난 사람 수 분포 보기"):
+                coverage_data = [
+                    {"만난 사람 수": partners, "인원": count}
+                    for partners, count in usage_stats['coverage_distribution'].items()
+                ]
+                st.dataframe(pd.DataFrame(coverage_data), hide_index=True)
+            
+            # 전체 배치 다운로드 (DataFrame 없이 배치에서 바로 스트리밍)
+            if st.button("📥 전체 결과 다운로드", use_container_width=True):
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 
-                df_download = pd.DataFrame(all_data)
-                csv = df_download.to_csv(index=False, encoding='utf-8-sig')
-                st.download_button(
-                    label="CSV 파일 다운로드",
-                    data=csv,
-                    file_name=f"짝교제_매칭결과_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
-                )
+                # 엑셀 호환을 위해 BOM이 붙은 UTF-8로 기록
+                csv_buffer = io.BytesIO()
+                with io.TextIOWrapper(csv_buffer, encoding='utf-8-sig', newline='', write_through=True) as text_buffer:
+                    pair_maker.export_csv(text_buffer)
+                    csv_data = csv_buffer.getvalue()
+                
+                jsonl_buffer = io.StringIO()
+                pair_maker.export_jsonl(jsonl_buffer)
+                
+                col_down1, col_down2 = st.columns(2)
+                with col_down1:
+                    st.download_button(
+                        label="CSV 파일 다운로드",
+                        data=csv_data,
+                        file_name=f"짝교제_매칭결과_{timestamp}.csv",
+                        mime="text/csv"
+                    )
+                with col_down2:
+                    st.download_button(
+                        label="JSONL 파일 다운로드",
+                        data=jsonl_buffer.getvalue(),
+                        file_name=f"짝교제_매칭결과_{timestamp}.jsonl",
+                        mime="application/jsonl"
+                    )
                 
         else:
             st.info("참가자를 입력하고 '짝 매칭 생성!' 버튼을 눌러주세요.")
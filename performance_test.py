@@ -1,5 +1,5 @@
 import time
-from pair_maker import OptimizedPairMaker
+from pair_maker import OptimizedPairMaker, TemplateLibrary, CompactSchedule, NameTable, verify_schedule
 
 def performance_test():
     """최적화된 알고리즘의 성능을 측정"""
@@ -55,5 +55,25 @@ def performance_test():
     print("\n" + "="*60)
     print("💡 결론: 최적화로 성능과 안정성이 크게 향상됨!")
 
+def verify_performance_test():
+    """100만 개 조합 스케줄의 검증 시간을 측정"""
+    
+    print("\n🔍 스케줄 검증 성능 테스트")
+    print("="*60)
+    
+    # 2000명 1000배치 = 100만 개 조합
+    people_count, round_count = 2000, 1000
+    schedule = CompactSchedule(NameTable(list(range(people_count))))
+    for round_groups in TemplateLibrary.round_robin_rounds(people_count)[:round_count]:
+        schedule.append(round_groups)
+    
+    start_time = time.time()
+    result = verify_schedule(schedule, people_count=people_count)
+    execution_time = time.time() - start_time
+    
+    print(f"   ⏱️  검증 시간: {execution_time:.3f}초 ({result['edges']:,}개 조합)")
+    print(f"   ✅ 유효성: {result['valid']}")
+
 if __name__ == "__main__":
-    performance_test() 
\ No newline at end of file
+    performance_test()
+    verify_performance_test() 
\ No newline at end of file
@@ -1,5 +1,15 @@
-from pair_maker import OptimizedPairMaker
+from pair_maker import OptimizedPairMaker, TemplateLibrary, TEMPLATE_CACHE_VERSION, ScheduleStore, parse_people_text
+from pair_maker import CompactSchedule, NameTable, PairSet, PairHistory, verify_schedule
+from itertools import combinations
 import random
+import os
+import io
+import csv
+import json
+import tempfile
+import tracemalloc
+import gc
+import time
 
 def test_algorithm_limits():
     """알고리즘의 한계를 테스트"""
@@ -47,5 +57,584 @@ def test_algorithm_limits():
     print("\n" + "="*50)
     print("🔍 결론: 사용률이 70% 이상일 때 문제 발생 가능성 높음")
 
+def test_min_repeat_mode():
+    """새 조합이 바닥난 뒤 중복 최소화 모드 테스트"""
+    
+    print("\n🧪 중복 최소화 모드 테스트")
+    print("="*50)
+    
+    test_cases = [
+        {"people": 6, "arrangements": 12, "desc": "6명 12배치 (한계의 2배 이상)", "max_spread": 1},
+        {"people": 9, "arrangements": 15, "desc": "9명 15배치 (홀수 인원)", "max_spread": 2},
+        {"people": 60, "arrangements": 70, "desc": "60명 70배치 (대규모)", "max_spread": 1},
+    ]
+    
+    for case in test_cases:
+        print(f"\n📊 {case['desc']}")
+        people_list = list(range(1, case['people'] + 1))
+        
+        pair_maker = OptimizedPairMaker()
+        successful_count, message = pair_maker.generate_multiple_arrangements(
+            people_list, case['arrangements'], allow_repeats=True
+        )
+        
+        print(f"   ✅ 생성: {successful_count}/{case['arrangements']}개 배치")
+        if message:
+            print(f"      안내: {message}")
+        
+        assert successful_count == case['arrangements']
+        for arrangement in pair_maker.arrangements:
+            assert sorted(p for group in arrangement for p in group) == people_list
+        
+        # 전환 전까지의 배치는 중복이 없어야 함
+        fresh = pair_maker.arrangements[:pair_maker.repeat_from_round]
+        fresh_pairs = [pair_maker.pair_key(*pair) for arrangement in fresh
+                       for group in arrangement for pair in pair_maker.get_all_pairs_from_group(group)]
+        assert len(fresh_pairs) == len(set(fresh_pairs))
+        
+        # 만난 횟수는 모든 조합에 고르게 분산되어야 함
+        total_possible = case['people'] * (case['people'] - 1) // 2
+        counts = [count for count, _ in pair_maker.pair_history.values()]
+        counts += [0] * (total_possible - len(counts))
+        print(f"      조합별 만난 횟수: 최소 {min(counts)}회, 최대 {max(counts)}회")
+        assert max(counts) - min(counts) <= case['max_spread']
+        
+        # 중복 최소화 구간에서도 3명조 참여 횟수 차이는 1 이하
+        trio_spread = verify_schedule(pair_maker, allow_repeats=True)["trio_spread"]
+        print(f"      3명조 참여 횟수 차이: {trio_spread}")
+        assert trio_spread <= 1
+    
+    # 같은 횟수라면 최근에 만난 조합의 비용이 더 커야 함
+    pair_maker = OptimizedPairMaker()
+    pair_maker.add_arrangement([(1, 2), (3, 4)])
+    pair_maker.add_arrangement([(1, 3), (2, 4)])
+    pair_maker.add_arrangement([(2, 1), (6, 5)])
+    costs = [pair_maker.pair_cost(a, b, 3) for a, b in [(1, 4), (3, 4), (1, 3), (5, 6), (1, 2)]]
+    assert costs[0] == 0
+    assert costs == sorted(costs) and len(set(costs)) == len(costs)
+
+def test_trio_fairness():
+    """제약이 없을 때 3명조 참여 횟수 차이가 항상 1 이하인지 테스트"""
+    
+    print("\n🧪 3명조 공정성 테스트")
+    print("="*50)
+    
+    for people_count, target_count in [(11, 5), (13, 6), (21, 8)]:
+        people_list = list(range(people_count))
+        for seed in range(40):
+            random.seed(seed)
+            pair_maker = OptimizedPairMaker()
+            successful_count, _ = pair_maker.generate_multiple_arrangements(people_list, target_count)
+            assert successful_count == target_count
+            result = verify_schedule(pair_maker, people_count=people_count)
+            assert result["valid"] and result["is_trio_fair"], (people_count, seed, result)
+        print(f"   ✅ {people_count}명 {target_count}배치: 40개 시드 모두 공정")
+
+def test_pair_constraints():
+    """금지/고정 조합 제약 테스트"""
+    
+    print("\n🧪 금지/고정 조합 테스트")
+    print("="*50)
+    
+    key = OptimizedPairMaker.pair_key
+    people_list = list(range(1, 12))
+    forbidden_pairs = [(1, 2), (4, 3), (1, 5), (6, 8)]
+    required_pairs = {0: [(1, 3)], 2: [(2, 5), (7, 6)]}
+    forbidden_keys = {key(*pair) for pair in forbidden_pairs}
+    
+    for allow_repeats, target_count in [(False, 4), (True, 12)]:
+        random.seed(allow_repeats)
+        pair_maker = OptimizedPairMaker()
+        successful_count, message = pair_maker.generate_multiple_arrangements(
+            people_list, target_count, allow_repeats=allow_repeats,
+            forbidden_pairs=forbidden_pairs, required_pairs=required_pairs
+        )
+        
+        print(f"\n📊 11명 {target_count}배치 (중복 최소화: {allow_repeats})")
+        print(f"   ✅ 생성: {successful_count}/{target_count}개 배치")
+        assert successful_count == target_count, message
+        
+        for round_num, arrangement in enumerate(pair_maker.arrangements):
+            round_pairs = {key(*pair) for group in arrangement
+                           for pair in pair_maker.get_all_pairs_from_group(group)}
+            assert sorted(p for group in arrangement for p in group) == people_list
+            assert not round_pairs & forbidden_keys
+            for pair in required_pairs.get(round_num, []):
+                assert key(*pair) in round_pairs
+    
+    # 잘못된 입력은 예외 없이 오류 메시지로 처리
+    invalid_cases = [
+        (["a", "b", "c"], {"required_pairs": {0: [("a", "b")]}}, "3명조를 구성할 수 없습니다"),
+        (["a", "b", "c", "d", "e"], {"required_pairs": {0: [("a", "b"), ("c", "d")]}}, "3명조를 구성할 수 없습니다"),
+        (["a", "b", "c", "d"], {"required_pairs": {0: [("a", "b")]}, "forbidden_pairs": [("b", "a")]}, "금지 조합과 충돌"),
+        (["a", "b", "c", "d"], {"required_pairs": {0: [("a", "b")], 1: [("b", "a")]}}, "중복 지정"),
+        (["a", "b", "c", "d"], {"required_pairs": {0: [("a", "b"), ("a", "c")]}}, "여러 고정 조합"),
+        (["a", "b", "c", "d"], {"forbidden_pairs": [("a", "z")]}, "참가자 목록에 없는"),
+    ]
+    for people, constraints, expected in invalid_cases:
+        successful_count, message = OptimizedPairMaker().generate_multiple_arrangements(people, 2, **constraints)
+        print(f"   ⚠️ {message}")
+        assert successful_count == 0 and expected in message
+
+def test_template_library():
+    """디스크 캐시 템플릿 라이브러리 테스트"""
+    
+    print("\n🧪 템플릿 라이브러리 테스트")
+    print("="*50)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_path = os.path.join(cache_dir, "templates.json")
+        
+        for people_count, target_count in [(10, 9), (10, 4), (9, 4)]:
+            people_list = [f"참가자{i}" for i in range(people_count)]
+            
+            # 첫 실행은 템플릿 생성, 두 번째는 새 프로세스처럼 파일에서 읽기만 함
+            for library in [TemplateLibrary(cache_path), TemplateLibrary(cache_path)]:
+                pair_maker = OptimizedPairMaker(template_library=library)
+                successful_count, _ = pair_maker.generate_multiple_arrangements(people_list, target_count)
+                
+                assert successful_count == target_count
+                assert len(pair_maker.used_pairs) == sum(
+                    len(pair_maker.get_all_pairs_from_group(group)) for arrangement in pair_maker.arrangements
+                    for group in arrangement
+                )
+                for arrangement in pair_maker.arrangements:
+                    assert sorted(p for group in arrangement for p in group) == sorted(people_list)
+                
+                stats = pair_maker.get_trio_fairness_stats(people_list)
+                assert stats is None or stats["is_fair"]
+            
+            print(f"   ✅ {people_count}명 {target_count}배치: 템플릿 재라벨링 성공")
+        
+        with open(cache_path, encoding="utf-8") as f:
+            data = json.load(f)
+        assert data["version"] == TEMPLATE_CACHE_VERSION
+        assert set(data["templates"]) == {"10:2", "9:2"}
+        
+        # 짝수 인원은 n-1 라운드 템플릿 하나로 모든 배치 수를 처리
+        assert list(data["templates"]["10:2"]) == ["9"]
+        
+        # 버전이 다른 파일은 무시하고 다시 생성
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"version": TEMPLATE_CACHE_VERSION + 1, "templates": {"6:2": {"5": [[0]]}}}, f)
+        assert TemplateLibrary(cache_path).get_template(6, 5) is not None
+    
+    # 만들 수 없는 템플릿은 반복 호출해도 다시 계산하거나 파일을 쓰지 않음
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_path = os.path.join(cache_dir, "templates.json")
+        library = TemplateLibrary(cache_path)
+        builds = []
+        build_template = library.build_template
+        
+        def counting_build(people_count, target_count):
+            # 생성은 잠금 밖에서 실행되어야 함
+            assert library._lock.acquire(blocking=False)
+            library._lock.release()
+            builds.append((people_count, target_count))
+            return build_template(people_count, target_count)
+        
+        library.build_template = counting_build
+        random.seed(0)
+        for _ in range(3):
+            assert library.get_template(6, 10) is None  # 짝수 인원의 n-1 라운드 초과
+            assert library.get_template(7, 3) is None  # 공정한 3명조 배치가 없음
+        assert builds == [(7, 3)]
+        assert not os.path.exists(cache_path)
+        print("   ✅ 만들 수 없는 템플릿은 한 번만 계산")
+
+def test_incremental_statistics():
+    """점진적으로 갱신한 통계가 전체 재계산 결과와 같은지 테스트"""
+    
+    print("\n🧪 점진 통계 테스트")
+    print("="*50)
+    
+    people_list = list(range(1, 12))
+    pair_maker = OptimizedPairMaker()
+    pair_maker.generate_multiple_arrangements(people_list, 15, allow_repeats=True)
+    
+    # 전체 배치를 다시 훑어 기준값 계산
+    trio_counts = {person: 0 for person in people_list}
+    partners = {person: set() for person in people_list}
+    meetings = 0
+    for arrangement in pair_maker.arrangements:
+        for group in arrangement:
+            if len(group) == 3:
+                for person in group:
+                    trio_counts[person] += 1
+            for a, b in pair_maker.get_all_pairs_from_group(group):
+                partners[a].add(b)
+                partners[b].add(a)
+                meetings += 1
+    
+    fairness = pair_maker.get_trio_fairness_stats(people_list)
+    usage = pair_maker.get_usage_stats(people_list)
+    
+    assert fairness["actual_counts"] == trio_counts
+    assert fairness["actual_min"] == min(trio_counts.values())
+    assert fairness["actual_max"] == max(trio_counts.values())
+    assert fairness["total_trios"] == 15
+    assert usage["total_meetings"] == meetings
+    assert usage["used_pairs"] == len(set().union(*[
+        {pair_maker.pair_key(a, b) for b in partners[a]} for a in people_list
+    ]))
+    coverage = {}
+    for person in people_list:
+        coverage[len(partners[person])] = coverage.get(len(partners[person]), 0) + 1
+    assert usage["coverage_distribution"] == dict(sorted(coverage.items()))
+    assert len(usage["round_summaries"]) == 15
+    assert sum(r["new_pairs"] for r in usage["round_summaries"]) == usage["used_pairs"]
+    
+    # 같은 조회는 캐시된 결과를 그대로 반환
+    assert pair_maker.get_usage_stats(people_list) is usage
+    
+    print(f"   ✅ 사용률 {usage['usage_rate']:.1f}%, 평균 {usage['mean_partners']:.1f}명과 만남")
+
+def test_schedule_store():
+    """공유 스케줄 저장소와 일괄 입력 파싱 테스트"""
+    
+    print("\n🧪 스케줄 저장소 테스트")
+    print("="*50)
+    
+    people_list, duplicates = parse_people_text("철수\n영희, 민수\n\n  지수 ,철수\n")
+    assert people_list == ["철수", "영희", "민수", "지수"]
+    assert duplicates == ["철수"]
+    
+    store = ScheduleStore(max_schedules=2)
+    ids = []
+    for _ in range(3):
+        pair_maker = OptimizedPairMaker()
+        pair_maker.generate_multiple_arrangements(people_list, 2)
+        ids.append(store.put(pair_maker))
+    
+    # 가장 오래된 스케줄은 밀려나고, 최근 것은 id로 그대로 조회
+    assert len(store) == 2
+    assert store.get(ids[0]) is None
+    assert store.get(ids[2]).people_list == people_list
+    print(f"   ✅ 저장소 크기 {len(store)}개로 유지")
+
+def test_exporters():
+    """CSV / JSON Lines / Parquet 내보내기 테스트"""
+    
+    print("\n🧪 내보내기 테스트")
+    print("="*50)
+    
+    people_list = [f"참가자{i}" for i in range(1, 10)]
+    pair_maker = OptimizedPairMaker()
+    pair_maker.generate_multiple_arrangements(people_list, 3)
+    expected = [
+        (f"{i+1}차", f"{j+1}조", *group, *([None] * (3 - len(group))))
+        for i, arrangement in enumerate(pair_maker.arrangements)
+        for j, group in enumerate(arrangement)
+    ]
+    
+    csv_buffer = io.StringIO()
+    pair_maker.export_csv(csv_buffer)
+    csv_rows = list(csv.reader(io.StringIO(csv_buffer.getvalue())))
+    assert csv_rows[0] == ["배치차수", "조", "첫번째", "두번째", "세번째"]
+    assert csv_rows[1:] == [[value or "" for value in row] for row in expected]
+    
+    jsonl_buffer = io.StringIO()
+    pair_maker.export_jsonl(jsonl_buffer)
+    jsonl_rows = [json.loads(line) for line in jsonl_buffer.getvalue().splitlines()]
+    assert [tuple(row.values()) for row in jsonl_rows] == expected
+    print(f"   ✅ CSV/JSONL: {len(expected)}개 조")
+    
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("   ⏭️ pyarrow가 없어 Parquet 테스트 생략")
+        return
+    
+    with tempfile.TemporaryDirectory() as export_dir:
+        parquet_path = os.path.join(export_dir, "result.parquet")
+        pair_maker.export_parquet(parquet_path, batch_rows=4)
+        table = pq.read_table(parquet_path)
+        assert [tuple(row.values()) for row in table.to_pylist()] == expected
+    print("   ✅ Parquet: 4행 단위로 나눠 기록 후 동일하게 복원")
+
+def test_compact_schedule():
+    """배열 기반 압축 스케줄 테스트"""
+    
+    print("\n🧪 압축 스케줄 테스트")
+    print("="*50)
+    
+    people_list = [f"학생{i}" for i in range(101)]
+    pair_maker = OptimizedPairMaker()
+    pair_maker.generate_multiple_arrangements(people_list, 20, allow_repeats=True)
+    rounds = [list(arrangement) for arrangement in pair_maker.arrangements]
+    
+    # 같은 이름표를 공유하는 새 스케줄에 그대로 옮겨 담아도 튜플 보기가 같아야 함
+    name_table = NameTable(people_list)
+    schedule = CompactSchedule(name_table)
+    other = CompactSchedule(name_table)
+    for arrangement in rounds:
+        schedule.append(arrangement)
+        other.append(arrangement)
+    assert len(schedule) == 20 and len(name_table) == 101
+    assert list(schedule) == rounds
+    assert schedule[-1] == rounds[-1] and schedule[2:5] == rounds[2:5]
+    assert schedule.name_table is other.name_table
+    
+    ids, group_starts, round_group_starts = schedule.as_arrays()
+    assert ids.dtype.name == "int32" and len(ids) == 20 * 101
+    assert len(round_group_starts) == 21 and round_group_starts[-1] == len(group_starts)
+    first_group = rounds[0][0]
+    assert [name_table.names[i] for i in ids[group_starts[0]:group_starts[1]]] == list(first_group)
+    
+    schedule.clear()
+    assert len(schedule) == 0 and list(schedule) == []
+    
+    # 조합 집합과 이력은 뒤집힌 튜플도 같은 조합으로 보고, 값이 넘치면 배열을 넓힘
+    key = OptimizedPairMaker.pair_key
+    expected = {key(a, b) for arrangement in rounds for group in arrangement for a, b in combinations(group, 2)}
+    assert set(pair_maker.used_pairs) == expected and len(pair_maker.used_pairs) == len(expected)
+    assert all((b, a) in pair_maker.blocked_pairs for a, b in expected)
+    pair_set = PairSet(NameTable(["a", "b", "c"]), [("b", "a")])
+    pair_set.add(("a", "z"))  # 처음 보는 사람은 이름표에 추가
+    pair_set.discard(("a", "b"))
+    assert list(pair_set) == [("a", "z")] and ("z", "a") in pair_set and ("a", "b") not in pair_set
+    history = PairHistory(NameTable(["a", "b"]))
+    for round_num in range(300):
+        history.record(("b", "a"), round_num)
+    assert history.get(("a", "b")) == (300, 299) and len(history) == 1
+    
+    # 배치·조합 이력·탐색 인덱스를 모두 포함한 코호트 전체 메모리를 튜플 기반 구조와 비교
+    gc.collect()
+    tracemalloc.start()
+    cohorts = []
+    for _ in range(3):
+        cohort = OptimizedPairMaker()
+        cohort.generate_multiple_arrangements(people_list, 20)
+        cohorts.append(cohort)
+    gc.collect()
+    cohort_bytes = tracemalloc.get_traced_memory()[0] / len(cohorts)
+    tracemalloc.stop()
+    
+    tracemalloc.start()
+    legacy = []
+    for cohort in cohorts:
+        history = {}
+        for round_num, arrangement in enumerate(cohort.arrangements):
+            for group in arrangement:
+                for a, b in combinations(group, 2):
+                    history[key(a, b)] = [history.get(key(a, b), [0])[0] + 1, round_num]
+        legacy.append((list(cohort.arrangements), set(history), set(history), history))
+    gc.collect()
+    legacy_bytes = tracemalloc.get_traced_memory()[0] / len(cohorts)
+    tracemalloc.stop()
+    
+    print(f"   ✅ 코호트당 튜플 기반 {legacy_bytes / 1024:.0f}KB → 압축 {cohort_bytes / 1024:.0f}KB")
+    assert cohort_bytes * 4 < legacy_bytes
+
+def test_schedule_verifier():
+    """벡터화 검증기가 잘못된 스케줄을 잡아내는지 테스트"""
+    
+    print("\n🧪 스케줄 검증기 테스트")
+    print("="*50)
+    
+    people_list = list(range(7))
+    valid = [
+        [(0, 1), (2, 3), (4, 5, 6)],
+        [(1, 5), (3, 6), (0, 2, 4)],
+    ]
+    assert verify_schedule(valid)["valid"]
+    
+    # 뒤집힌 튜플도 같은 조합으로 판단해야 함
+    reversed_repeat = valid + [[(1, 0), (2, 4), (3, 5, 6)]]
+    result = verify_schedule(reversed_repeat)
+    assert not result["valid"] and result["repeated_edges"] >= 1
+    assert verify_schedule(reversed_repeat, allow_repeats=True)["errors"] == []
+    
+    # 빠진 사람 / 두 번 나온 사람
+    assert not verify_schedule(valid + [[(0, 3), (1, 5), (2, 4, 2)]], people_count=7)["valid"]
+    # 3명조 없는 홀수 배치, 4명조
+    assert not verify_schedule([[(0, 1), (2, 3), (4, 5), (6,)]])["valid"]
+    assert not verify_schedule([[(0, 1, 2, 3), (4, 5, 6)]])["valid"]
+    # 금지 조합
+    assert not verify_schedule(valid, forbidden_pairs=[(3, 2)])["valid"]
+    
+    # 3명조 공정성
+    unfair = [[(0, 1), (2, 3), (4, 5, 6)], [(0, 2), (1, 3), (4, 5, 6)]]
+    assert verify_schedule(unfair, allow_repeats=True)["trio_spread"] == 2
+    assert not verify_schedule(unfair, allow_repeats=True)["is_trio_fair"]
+    print("   ✅ 중복(뒤집힌 튜플 포함), 분할, 조 크기, 금지 조합, 공정성 검사 통과")
+
+def run_engine(mode, people_list, target_count, seed, cache_path):
+    """같은 시드로 생성 모드 하나를 실행 ((pair_maker, 생성 수, 메시지, 금지 조합) 반환)"""
+    random.seed(seed)
+    forbidden_pairs = None
+    
+    if mode == "template":
+        pair_maker = OptimizedPairMaker(template_library=TemplateLibrary(cache_path))
+    else:
+        pair_maker = OptimizedPairMaker()
+    
+    kwargs = {}
+    if mode == "min_repeat":
+        kwargs["allow_repeats"] = True
+    elif mode == "constraints":
+        # 전체 조합의 10%를 금지
+        all_pairs = list(combinations(people_list, 2))
+        forbidden_pairs = random.sample(all_pairs, len(all_pairs) // 10)
+        kwargs["forbidden_pairs"] = forbidden_pairs
+    
+    if mode == "diverse":
+        # 앞선 후보들을 피해 만든 마지막 후보를 검증
+        candidates = pair_maker.generate_diverse_candidates(people_list, target_count, candidate_count=3)
+        pair_maker, successful_count, message = candidates[-1]
+        return pair_maker, successful_count, message, forbidden_pairs
+    
+    successful_count, message = pair_maker.generate_multiple_arrangements(people_list, target_count, **kwargs)
+    return pair_maker, successful_count, message, forbidden_pairs
+
+class CountingPairMaker(OptimizedPairMaker):
+    """최소 비용 매칭 호출 수를 세는 pair_maker (탐색 비용 확인용)"""
+    min_cost_calls = 0
+    
+    def construct_min_cost_arrangement(self, people_list, trio_members=None):
+        CountingPairMaker.min_cost_calls += 1
+        return super().construct_min_cost_arrangement(people_list, trio_members)
+
+def test_differential_engines():
+    """모든 생성 모드를 같은 시드 입력으로 실행해 결과를 교차 검증"""
+    
+    print("\n🧪 생성 모드 교차 검증")
+    print("="*50)
+    
+    modes = ["search", "template", "min_repeat", "constraints", "diverse"]
+    cases = [(6, 5), (7, 3), (10, 6), (11, 4), (16, 10), (21, 8)]
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_path = os.path.join(cache_dir, "templates.json")
+        
+        for people_count, target_count in cases:
+            people_list = list(range(people_count))
+            
+            has_template = TemplateLibrary(cache_path).get_template(people_count, target_count) is not None
+            
+            for seed in range(3):
+                counts = {}
+                for mode in modes:
+                    pair_maker, successful_count, message, forbidden_pairs = run_engine(
+                        mode, people_list, target_count, seed, cache_path
+                    )
+                    counts[mode] = successful_count
+                    
+                    # 모든 모드: 보고한 배치 수와 실제 배치 수가 같고 스케줄이 유효해야 함
+                    result = verify_schedule(pair_maker, people_count=people_count,
+                                             allow_repeats=(mode == "min_repeat"),
+                                             forbidden_pairs=forbidden_pairs)
+                    assert result["valid"], (mode, people_count, seed, result["errors"])
+                    assert result["rounds"] == successful_count
+                    if successful_count < target_count:
+                        assert message, (mode, people_count, seed)
+                    
+                    # 엔진 자체 통계와 검증기의 공정성 판단이 일치해야 함
+                    stats = pair_maker.get_trio_fairness_stats(people_list)
+                    if stats and successful_count:
+                        assert stats["actual_max"] - stats["actual_min"] == result["trio_spread"]
+                    
+                    # 템플릿이 만들어진 경우에는 공정성이 보장되어야 함
+                    # (7명 3배치처럼 공정한 배치가 없으면 템플릿 없이 탐색으로 대체)
+                    if mode == "template" and has_template:
+                        assert result["is_trio_fair"], (people_count, seed)
+                    
+                    # 중복 최소화 모드: 전환 전 구간은 중복이 없어야 함
+                    if mode == "min_repeat":
+                        fresh = pair_maker.arrangements[:pair_maker.repeat_from_round]
+                        assert verify_schedule(fresh, people_count=people_count)["repeated_edges"] == 0
+                
+                # 템플릿과 중복 최소화 모드는 항상 목표 수를 채우고, 템플릿은 공정해야 함
+                assert counts["min_repeat"] == target_count
+                assert counts["template"] == target_count or people_count % 2
+                assert max(counts.values()) <= target_count
+            
+            print(f"   ✅ {people_count}명 {target_count}배치: {counts}")
+    
+    # 다양한 후보 모드의 비용: 빠른 탐색을 그대로 쓰므로 최소 비용 매칭 없이
+    # 따로 생성하는 것과 비슷한 시간 안에 끝나야 함
+    people_list = list(range(100))
+    random.seed(0)
+    start = time.perf_counter()
+    for _ in range(5):
+        OptimizedPairMaker().generate_multiple_arrangements(people_list, 20)
+    independent_seconds = time.perf_counter() - start
+    
+    random.seed(0)
+    CountingPairMaker.min_cost_calls = 0
+    start = time.perf_counter()
+    candidates = CountingPairMaker().generate_diverse_candidates(people_list, 20, candidate_count=5)
+    diverse_seconds = time.perf_counter() - start
+    
+    assert [successful_count for _, successful_count, _ in candidates] == [20] * 5
+    assert CountingPairMaker.min_cost_calls == 0
+    assert diverse_seconds <= 5 * independent_seconds + 0.5, (diverse_seconds, independent_seconds)
+    print(f"   ✅ 100명 20배치 후보 5개: {diverse_seconds:.2f}초 (따로 생성 {independent_seconds:.2f}초)")
+
+def test_diverse_candidates():
+    """한 번에 만든 후보 스케줄들이 모두 유효하고 서로 덜 겹치는지 테스트"""
+    
+    print("\n🧪 다양한 후보 생성 테스트")
+    print("="*50)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        library = TemplateLibrary(os.path.join(cache_dir, "templates.json"))
+        
+        for people_count, target_count in [(10, 3), (20, 4), (21, 5)]:
+            random.seed(people_count)
+            people_list = list(range(people_count))
+            candidates = OptimizedPairMaker(template_library=library).generate_diverse_candidates(
+                people_list, target_count, candidate_count=3
+            )
+            assert len(candidates) == 3
+            
+            for pair_maker, successful_count, message in candidates:
+                assert successful_count == target_count and message is None
+                result = verify_schedule(pair_maker, people_count=people_count)
+                assert result["valid"] and result["is_trio_fair"], result
+                # 생성이 끝난 후보는 공유 카운터와 분리되어야 함
+                assert pair_maker.diversity_counts == {}
+            
+            # 같은 입력으로 따로 생성한 스케줄보다 서로 덜 겹쳐야 함
+            overlaps = [first.shared_pair_ratio(second)
+                        for (first, _, _), (second, _, _) in combinations(candidates, 2)]
+            independent = []
+            for _ in range(3):
+                pair_maker = OptimizedPairMaker()
+                pair_maker.generate_multiple_arrangements(people_list, target_count)
+                independent.append(pair_maker)
+            independent_overlaps = [first.shared_pair_ratio(second) for first, second in combinations(independent, 2)]
+            assert max(overlaps) <= 0.2
+            assert sum(overlaps) <= sum(independent_overlaps)
+            print(f"   ✅ {people_count}명 {target_count}배치: 후보 간 겹침 {max(overlaps):.0%} "
+                  f"(따로 생성 시 {max(independent_overlaps):.0%})")
+    
+    # 제약 오류는 한 번만 검증해서 그대로 보고
+    pair_maker = OptimizedPairMaker()
+    candidates = pair_maker.generate_diverse_candidates([1, 2, 3, 4], 5, candidate_count=3)
+    assert candidates == [(pair_maker, 0, "요청한 배치 수가 수학적으로 불가능합니다.")]
+    
+    # 고정 조합은 모든 후보에 들어가야 함
+    random.seed(3)
+    candidates = OptimizedPairMaker().generate_diverse_candidates(
+        list(range(8)), 3, candidate_count=2, forbidden_pairs=[(0, 1)], required_pairs={1: [(2, 3)]}
+    )
+    for pair_maker, successful_count, _ in candidates:
+        assert successful_count == 3
+        assert verify_schedule(pair_maker, forbidden_pairs=[(0, 1)])["valid"]
+        assert (2, 3) in [tuple(sorted(group)) for group in pair_maker.arrangements[1]]
+    print("   ✅ 제약 검증과 고정 조합 공유 통과")
+
 if __name__ == "__main__":
-    test_algorithm_limits() 
\ No newline at end of file
+    test_algorithm_limits()
+    test_min_repeat_mode()
+    test_trio_fairness()
+    test_pair_constraints()
+    test_template_library()
+    test_incremental_statistics()
+    test_schedule_store()
+    test_exporters()
+    test_compact_schedule()
+    test_schedule_verifier()
+    test_differential_engines()
+    test_diverse_candidates() 
\ No newline at end of file